@@ -1,5 +1,5 @@
 """Taransay database library."""
 
-from .device import Device, FloatDevice
+from .device import Device, FloatDevice, BinaryFloatDevice
 
-ALL = (Device, FloatDevice)
+ALL = (Device, FloatDevice, BinaryFloatDevice)
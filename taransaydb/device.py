@@ -1,8 +1,10 @@
 """Devices."""
 
+from array import array
 from pathlib import Path
 from contextlib import contextmanager
-from .driver import DirectoryDriver, DriverAccessType
+from datetime import datetime, time, timedelta
+from .driver import BinaryDirectoryDriver, DirectoryDriver, DriverAccessType
 
 
 class Device:
@@ -34,6 +36,29 @@ class Device:
         """Open the device driver in write mode."""
         return self._yield_driver_with_mode(DriverAccessType.WRITE)
 
+    def append_many(self, rows):
+        """Append many rows of data to the device.
+
+        Parameters
+        ----------
+        rows : iterable
+            The (tick, data) pairs to store.
+        """
+        with self.writer() as driver:
+            driver.append_many(rows)
+
+    def compact(self, before=None):
+        """Compress the device's day files.
+
+        Parameters
+        ----------
+        before : :py:class:`datetime.date`, optional
+            Only compress day files for dates earlier than this. Defaults to compressing all day
+            files.
+        """
+        with self.writer() as driver:
+            driver.compact(before=before)
+
     def sort(self):
         """Sort the device's data in ascending order of time."""
         with self.writer() as driver:
@@ -43,23 +68,44 @@ class Device:
         """Convert the supplied list items to strings."""
         return [str(value) for value in data]
 
+    def format_line(self, tick_time, data):
+        """Format the supplied time of day and data as a line of a day file."""
+        return f"{tick_time} {' '.join(self.format_data(data))}\n"
+
     def parse_data(self, data):
         """No-op pass-through of the supplied data."""
         return data
 
+    def parse_columns(self, columns):
+        """No-op pass-through of the supplied data columns."""
+        return columns
+
     def __str__(self):
         return self.name
 
     def __repr__(self):
         return f"{self.__class__.__name__}({self.name})"
 
-    def _yield_driver_with_mode(self, mode):
-        ctx_driver = DirectoryDriver(
-            self.path, mode, self.encoding, self.format_data, self.parse_data
+    def _make_driver(self, mode):
+        """Create an unopened driver for this device's data with the specified access type."""
+        return DirectoryDriver(
+            self.path,
+            mode,
+            self.encoding,
+            self.format_line,
+            self.parse_data,
+            self.parse_columns,
         )
+
+    def _yield_driver_with_mode(self, mode):
+        ctx_driver = self._make_driver(mode)
         ctx_driver.open()
-        yield ctx_driver
-        ctx_driver.close()
+
+        try:
+            yield ctx_driver
+        finally:
+            # Write any buffered data even if the block raised.
+            ctx_driver.close()
 
 
 class FloatDevice(Device):
@@ -71,7 +117,81 @@ class FloatDevice(Device):
 
     def __init__(self, database, name):
         super().__init__(database, name, encoding="iso-8859-1")
+        self._line_formats = {}
+
+    def format_line(self, tick_time, data):
+        """Format the supplied time of day and floats as a line of a day file.
+
+        This gives the same result as :meth:`.Device.format_line`, but formats the whole line in
+        one operation with a format string cached for each number of columns.
+        """
+        try:
+            line_format = self._line_formats[len(data)]
+        except KeyError:
+            line_format = self._line_formats[len(data)] = (
+                "%s" + " %s" * len(data) + "\n"
+            )
+
+        return line_format % (tick_time, *data)
 
     def parse_data(self, data):
         """Parse the specified data as floats."""
         return [float(value) for value in data]
+
+    def parse_columns(self, columns):
+        """Parse the specified data columns as arrays of floats."""
+        return [array("d", map(float, column)) for column in columns]
+
+    def read_arrays(self, start, stop):
+        """Read the data in the half-open interval [`start`, `stop`) as arrays.
+
+        Parameters
+        ----------
+        start, stop : :py:class:`datetime.datetime`
+            The interval to read.
+
+        Returns
+        -------
+        :class:`tuple`
+            The times as microseconds since 1970-01-01T00:00 in an :class:`array.array` of type
+            ``q``, and a list with an :class:`array.array` of type ``d`` for each data column. See
+            :meth:`.Cursor.to_arrays`.
+        """
+        with self.reader() as driver:
+            return driver.query_interval(start, stop).to_arrays()
+
+
+class BinaryFloatDevice(FloatDevice):
+    """Device for storing a fixed number of float columns in binary day files.
+
+    The day files are not human-readable, but are much faster to read and write than text, and
+    are searched without an index. See :class:`.BinaryDirectoryDriver`.
+    """
+
+    def __init__(self, database, name, ncols):
+        super().__init__(database, name)
+        self.ncols = ncols
+
+    def import_device(self, device):
+        """Copy all of the data of a text device storing floats into this device.
+
+        The data is copied a day at a time, so each day is held in memory while it's written.
+        Days are found by listing the other device's day files through its driver, and read with
+        interval queries, which assume the data is sorted; rows out of order may be missed. Rows
+        are appended after any data this device already has for the same days, and any time zone
+        information is dropped.
+
+        Parameters
+        ----------
+        device : :class:`.Device`
+            The device to copy. Its data must be sorted.
+        """
+        with device.reader() as reader, self.writer() as writer:
+            for shard_date in reader._shard_dates():
+                midnight = datetime.combine(shard_date, time())
+                writer.append_many(
+                    reader.query_interval(midnight, midnight + timedelta(days=1))
+                )
+
+    def _make_driver(self, mode):
+        return BinaryDirectoryDriver(self.path, mode, self.ncols)
@@ -1,15 +1,88 @@
 """Database driver."""
 
+import io
 import os
+import re
+import sys
+import gzip
+import mmap
+import shutil
+import struct
+import subprocess
+from array import array
+from bisect import bisect_left, bisect_right
 from enum import Flag, auto
 from pathlib import Path
 from tempfile import NamedTemporaryFile
 from heapq import merge
-from functools import wraps
-from datetime import datetime, time, timedelta
+from itertools import chain, islice
+from operator import itemgetter, le
+from functools import partial, wraps
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, time, timedelta
+from collections import OrderedDict, deque
 from collections.abc import Iterable, Reversible
 from .exceptions import ProgrammingError
 
+SOFT_MAX_BUFFER_LEN = 1 << 17
+"""Size in bytes above which a shard's pending appends are written to disk."""
+
+PREFETCH_SHARDS = 16
+"""Number of upcoming day files to open and ask the operating system to read ahead of a query.
+
+This must be less than :data:`MAX_OPEN_SHARDS`, so that prefetched files stay open until they're
+read.
+"""
+
+MAX_OPEN_SHARDS = 64
+"""Maximum number of day files a driver keeps open at once."""
+
+MAX_EXPANDED_SHARDS = 4
+"""Maximum number of compressed day files a driver keeps decompressed in memory at once."""
+
+MAX_PENDING_INSERTS = 4096
+"""Maximum number of inserts a driver holds in memory for a day file before merging them in."""
+
+SORT_RUN_LINES = 1 << 16
+"""Maximum number of lines a driver sorts in memory at once."""
+
+SYSTEM_SORT_MIN_SIZE = 1 << 20
+"""Minimum size in bytes of a day file for a driver to sort it with the system's ``sort`` command.
+
+Smaller files sort about as quickly in Python, without the cost of starting a process.
+"""
+
+INDEX_STRIDE = 1 << 16
+"""Approximate number of bytes of a day file between consecutive entries in its index."""
+
+
+_match_plain_time = re.compile(r"\d\d:\d\d:\d\d(\.\d{6})?").fullmatch
+
+
+EPOCH_DATE = date(1970, 1, 1)
+"""Date from which :meth:`.Cursor.to_arrays` counts time."""
+
+US_PER_DAY = 86400 * 1000000
+"""Number of microseconds in a day."""
+
+
+def time_to_us(value):
+    """Convert a :py:class:`datetime.time` to microseconds since midnight.
+
+    Any time zone information is ignored.
+    """
+    return (
+        (value.hour * 60 + value.minute) * 60 + value.second
+    ) * 1000000 + value.microsecond
+
+
+def us_to_time(value):
+    """Convert microseconds since midnight to a :py:class:`datetime.time`."""
+    seconds, microsecond = divmod(value, 1000000)
+    minutes, second = divmod(seconds, 60)
+    hour, minute = divmod(minutes, 60)
+    return time(hour, minute, second, microsecond)
+
 
 def requires_access_type(access_type):
     """Check that the driver is opened in correct access mode before executing wrapped method."""
@@ -42,25 +115,43 @@ class DriverAccessType(Flag):
     @classmethod
     def file_mode(cls, flag):
         """Map the specified flag to a Python file mode."""
-        access_map = {
-            cls.APPEND: "a",
-            cls.READ: "r",
-            # Note: write mode is not used anywhere... yet.
-        }
+        return _FILE_MODES[flag]
 
-        return access_map[flag]
+
+_FILE_MODES = {
+    DriverAccessType.APPEND: "ab",
+    DriverAccessType.READ: "rb",
+    # Note: write mode is not used anywhere... yet.
+}
+"""Python file mode for each driver access type."""
 
 
 class DirectoryDriver:
     """Directory-based database driver."""
 
-    def __init__(self, path, access_type, encoding, format_fnc, parse_fnc):
+    SHARD_SUFFIX = ".txt"
+    """File name suffix of day files."""
+
+    def __init__(
+        self, path, access_type, encoding, format_line_fnc, parse_fnc, parse_columns_fnc
+    ):
         self._path = Path(path)
         self.access_type = access_type
         self.encoding = encoding
-        self._format_data = format_fnc
+        self._format_line = format_line_fnc
         self._parse_data = parse_fnc
-        self._file_cache = {}
+        self._parse_columns = parse_columns_fnc
+        self._file_cache = OrderedDict()
+        self._write_buffers = {}
+        self._pending_inserts = {}
+        self._unindexed_shards = set()
+        self._view_cache = {}
+        self._expanded_views = OrderedDict()
+        self._bounds_cache = {}
+        self._index_cache = {}
+        self._path_cache = {}
+        self._hot_append_date = None
+        self._hot_append = None
         self._is_open = False
 
     @property
@@ -81,18 +172,38 @@ class DirectoryDriver:
     def close(self):
         """Close the database.
 
-        This closes any open file objects.
+        This writes any pending appends and inserts, and closes any open file objects. Appends are
+        written and files are closed even if merging the inserts for a day file fails.
         """
-        for shard in self._file_cache.values():
-            shard.close()
+        try:
+            self._merge_all_inserts()
+        finally:
+            try:
+                self._flush_write_buffers()
+                self._update_indexes()
+            finally:
+                for view in self._view_cache.values():
+                    view.close()
 
-        self._is_open = False
+                for shard in self._file_cache.values():
+                    shard.close()
+
+                self._view_cache.clear()
+                self._expanded_views.clear()
+                self._file_cache.clear()
+                self._index_cache.clear()
+                self._is_open = False
 
     def flush(self):
         """Perform any pending write operations on open file objects."""
+        self._merge_all_inserts()
+        self._flush_write_buffers()
+
         for shard in self._file_cache.values():
             shard.flush()
 
+        self._update_indexes()
+
     @requires_access_type(DriverAccessType.READ)
     def query_interval(self, start, stop):
         """Query data between start and stop.
@@ -104,6 +215,10 @@ class DirectoryDriver:
         Queries with the same start and stop values always return an empty result, even if a data
         point lies exactly at that time.
 
+        Each day file must be sorted in ascending order of time (see
+        :meth:`~DirectoryDriver.sort`). Days are skipped based on their first and last lines, and
+        searched by bisection, so a misordered day can silently return the wrong rows.
+
         Returns
         -------
         :class:`.Cursor`
@@ -111,6 +226,26 @@ class DirectoryDriver:
         """
         return Cursor.from_range(self, start, stop)
 
+    @requires_access_type(DriverAccessType.READ)
+    def query_intervals(self, intervals):
+        """Query data within any of the specified intervals.
+
+        Each interval is half-open, and each day file must be sorted, as for
+        :meth:`~DirectoryDriver.query_interval`. Overlapping intervals are merged, so each row is
+        returned at most once and in time order, and each day file is only read once.
+
+        Parameters
+        ----------
+        intervals : iterable
+            The (start, stop) pairs to query.
+
+        Returns
+        -------
+        :class:`.Cursor`
+            The result cursor from which to read the query results.
+        """
+        return Cursor.from_ranges(self, intervals)
+
     @requires_access_type(DriverAccessType.APPEND)
     def append(self, tick, data):
         """Append data to the end of the corresponding day file.
@@ -122,9 +257,123 @@ class DirectoryDriver:
         data : sequence
             A sequence of data to store.
         """
-        shard_path = self._shard_path(tick.date())
-        fp = self._shard_stream(shard_path, DriverAccessType.APPEND, create=True)
-        fp.write(self._format_line(tick.time(), data))
+        self._append_line(tick, data)
+
+    @requires_access_type(DriverAccessType.APPEND)
+    def append_many(self, rows):
+        """Append many rows of data to the end of the corresponding day files.
+
+        This is equivalent to calling :meth:`~DirectoryDriver.append` for each row, but the rows
+        are first grouped by day so that each day file receives a single write.
+
+        Parameters
+        ----------
+        rows : iterable
+            The (tick, data) pairs to store, where `tick` is a :py:class:`datetime.datetime` and
+            `data` is a sequence of data.
+        """
+        rows_by_date = {}
+
+        for tick, data in rows:
+            row = tick.time(), data
+
+            try:
+                rows_by_date[tick.date()].append(row)
+            except KeyError:
+                rows_by_date[tick.date()] = [row]
+
+        for shard_date, shard_rows in rows_by_date.items():
+            shard_path = self._shard_path(shard_date)
+            self._shard_stream(shard_path, DriverAccessType.APPEND, create=True)
+            # Keep the rows behind any earlier appends still waiting in the buffer.
+            self._flush_write_buffer(shard_path, self._encode_lines(shard_rows))
+
+    def _encode_line(self, tick_time, data):
+        """Encode a row as it is stored in a day file."""
+        return self._format_line(tick_time, data).encode(self.encoding)
+
+    def _encode_lines(self, rows):
+        """Encode (time of day, data) rows as they are stored in a day file."""
+        format_line = self._format_line
+        return "".join(
+            [format_line(tick_time, data) for tick_time, data in rows]
+        ).encode(self.encoding)
+
+    def _append_line(self, tick, data):
+        """Add a line to the write buffer of the corresponding day file.
+
+        The buffer is only written to disk once it exceeds :data:`SOFT_MAX_BUFFER_LEN` bytes, or
+        when the driver is flushed or closed.
+        """
+        shard_date = tick.date()
+
+        if shard_date == self._hot_append_date:
+            # Consecutive appends usually go to the same day, whose file and buffer are already
+            # known.
+            shard_path, fp, buf = self._hot_append
+        else:
+            shard_path = self._shard_path(shard_date)
+            fp = self._shard_stream(shard_path, DriverAccessType.APPEND, create=True)
+
+            try:
+                buf = self._write_buffers[shard_path]
+            except KeyError:
+                buf = self._write_buffers[shard_path] = bytearray()
+
+            self._hot_append_date = shard_date
+            self._hot_append = shard_path, fp, buf
+
+        buf.extend(self._encode_line(tick.time(), data))
+
+        if len(buf) >= SOFT_MAX_BUFFER_LEN:
+            self._write_all(fp, buf)
+            buf.clear()
+            self._unindexed_shards.add(shard_path)
+
+    def _flush_write_buffer(self, shard_path, data=b""):
+        """Write the pending appends for the specified shard to its file object, followed by
+        `data`."""
+        if self._hot_append is not None and self._hot_append[0] == shard_path:
+            # The buffer is about to be discarded, and the file may be about to be closed.
+            self._hot_append_date = self._hot_append = None
+
+        buf = self._write_buffers.pop(shard_path, None)
+
+        if buf or data:
+            self._write_all(self._file_cache[shard_path], buf or b"", data)
+            self._unindexed_shards.add(shard_path)
+
+    @staticmethod
+    def _write_all(fp, *chunks):
+        """Write all of the specified chunks of data, in order, to an unbuffered binary stream.
+
+        Where supported, multiple chunks are written together with a single system call rather
+        than one each.
+        """
+        views = [memoryview(chunk) for chunk in chunks if chunk]
+
+        if len(views) > 1 and hasattr(os, "writev"):
+            fd = fp.fileno()
+
+            while views:
+                written = os.writev(fd, views)
+
+                # Drop the chunks that were written in full, and the written part of the next.
+                while views and written >= len(views[0]):
+                    written -= len(views.pop(0))
+
+                if written:
+                    views[0] = views[0][written:]
+
+            return
+
+        for view in views:
+            while view:
+                view = view[fp.write(view) :]
+
+    def _flush_write_buffers(self):
+        for shard_path in list(self._write_buffers):
+            self._flush_write_buffer(shard_path)
 
     @requires_access_type(DriverAccessType.WRITE)
     def insert(self, tick, data):
@@ -132,6 +381,14 @@ class DirectoryDriver:
 
         This assumes the data is already ordered.
 
+        Inserts are held in memory and merged into their day files together when the driver is
+        flushed or closed, or once :data:`MAX_PENDING_INSERTS` are waiting for a day file. Each
+        day file is therefore rewritten once for many inserts, rather than once per insert.
+
+        Inserts are not durable until they are merged: any still held in memory are lost if the
+        process exits without flushing or closing the driver. Call
+        :meth:`~DirectoryDriver.flush` to merge them.
+
         If you know your `tick` is later than the last reading in the corresponding day file, then
         you should use the much quicker :meth:`~DirectoryDriver.append` method.
 
@@ -142,8 +399,29 @@ class DirectoryDriver:
         data : sequence
             A sequence of data to store.
         """
-        tick_date = tick.date()
-        shard_path = self._shard_path(tick_date)
+        shard_path = self._shard_path(tick.date())
+        tick_time = tick.time()
+        row = tick_time, self._encode_line(tick_time, data)
+
+        try:
+            pending = self._pending_inserts[shard_path]
+        except KeyError:
+            pending = self._pending_inserts[shard_path] = []
+
+        pending.append(row)
+
+        if len(pending) >= MAX_PENDING_INSERTS:
+            self._merge_inserts(shard_path)
+
+    def _merge_inserts(self, shard_path):
+        """Merge the pending inserts for a day file into it, rewriting it once."""
+        pending = self._pending_inserts.pop(shard_path, None)
+
+        if not pending:
+            return
+
+        # The sort is stable, so inserts at identical times keep their order.
+        pending.sort(key=itemgetter(0))
 
         fp_existing, fp_temp = self._shard_stream_with_tmp_buffer(
             shard_path,
@@ -151,50 +429,173 @@ class DirectoryDriver:
             create=True,
         )
 
-        # Ensure buffered data is written.
-        fp_existing.flush()
+        try:
+            view = self._shard_view(shard_path)
+            size = os.fstat(fp_existing.fileno()).st_size
+            unterminated = self._shard_unterminated(view, size)
+            position = 0
+
+            for line_time, line in pending:
+                # Each line should be inserted before the first existing line later than it. Copy
+                # the existing lines up to there without reading them.
+                pivot = self._seek_shard_time(shard_path, view, line_time, after=True)
+                self._copy_range(fp_existing, fp_temp, position, pivot - position)
+
+                if unterminated and pivot == size:
+                    # End the existing last line (e.g. from a hand edit) before adding lines after
+                    # it.
+                    fp_temp.write(b"\n")
+                    unterminated = False
+
+                fp_temp.write(line)
+                position = pivot
+
+            self._copy_range(fp_existing, fp_temp, position, size - position)
+        except BaseException:
+            # Don't leave the partial copy in the data directory.
+            fp_temp.close()
+            os.unlink(fp_temp.name)
+            raise
+
+        # Substitute the shard with the temporary buffer.
+        self._shard_replace(fp_existing, fp_temp)
+
+    @staticmethod
+    def _shard_unterminated(view, size):
+        """Check whether the last line of a day file of the specified size lacks a newline."""
+        if not size:
+            return False
+
+        view.seek(size - 1)
+
+        return view.read(1) != b"\n"
 
-        pivot_time = tick.time()
-        pivot_passed = False
-        insert_line = self._format_line(pivot_time, data)
+    def _merge_all_inserts(self):
+        """Merge the pending inserts for every day file.
 
-        for line in self._read_lines(fp_existing):
-            if pivot_passed:
-                # Just copy the line directly.
-                fp_temp.file.write(line + "\n")
+        Every day file is merged even if another fails, in which case the first error is raised
+        once the rest are done.
+        """
+        error = None
+
+        for shard_path in list(self._pending_inserts):
+            try:
+                self._merge_inserts(shard_path)
+            except Exception as e:
+                if error is None:
+                    error = e
+
+        if error is not None:
+            raise error
+
+    @requires_access_type(DriverAccessType.WRITE)
+    def compact(self, before=None):
+        """Compress day files to save space.
+
+        Day files are compressed with gzip (so they can still be read with e.g. `zcat`). Compressed
+        day files are decompressed in memory when queried, and restored to plain text when next
+        written to. They are skipped by :meth:`~DirectoryDriver.sort`, so sort any misordered data
+        first.
+
+        Parameters
+        ----------
+        before : :py:class:`datetime.date`, optional
+            Only compress day files for dates earlier than this. Defaults to compressing all day
+            files.
+        """
+        self._merge_all_inserts()
+
+        for shard_path in list(self._shard_paths()):
+            if before is not None and self._shard_date(shard_path) >= before:
                 continue
 
-            line_time, _ = self._parse_line_time(line)
+            self._compress_shard(shard_path)
 
-            if line_time > pivot_time:
-                # The insert data should be inserted before this line.
-                fp_temp.file.write(insert_line)
-                pivot_passed = True
+    def _compress_shard(self, shard_path):
+        """Replace a day file with a gzip-compressed copy."""
+        self._close_shard(shard_path)
 
-            # Copy the existing line into the new file.
-            fp_temp.file.write(line + "\n")
+        with shard_path.open("rb") as fp, NamedTemporaryFile(
+            mode="wb", prefix=shard_path.name, dir=str(shard_path.parent), delete=False
+        ) as fp_temp:
+            with gzip.GzipFile(fileobj=fp_temp, mode="wb") as fp_compressed:
+                shutil.copyfileobj(fp, fp_compressed)
 
-        if not pivot_passed:
-            # The insert line is at the end.
-            fp_temp.file.write(insert_line)
+            fp_temp.flush()
+            os.fsync(fp_temp.fileno())
 
-        # Substitute the shard with the temporary buffer.
-        self._shard_replace(fp_existing, fp_temp)
+        os.replace(fp_temp.name, self._compressed_path(shard_path))
+        shard_path.unlink()
+        self._bounds_cache.pop(shard_path, None)
+        self._index_cache.pop(shard_path, None)
+        self._unindexed_shards.discard(shard_path)
+
+        try:
+            self._index_path(shard_path).unlink()
+        except FileNotFoundError:
+            pass
+
+    def _expand_shard(self, shard_path):
+        """Restore a compressed day file to plain text."""
+        compressed_path = self._compressed_path(shard_path)
+
+        with gzip.open(compressed_path, "rb") as fp_compressed, NamedTemporaryFile(
+            mode="wb", prefix=shard_path.name, dir=str(shard_path.parent), delete=False
+        ) as fp_temp:
+            shutil.copyfileobj(fp_compressed, fp_temp)
+            fp_temp.flush()
+            os.fsync(fp_temp.fileno())
+
+        os.replace(fp_temp.name, shard_path)
+        compressed_path.unlink()
+        self._expanded_views.pop(shard_path, None)
+        self._update_index(shard_path, rebuild=True)
 
     @requires_access_type(DriverAccessType.WRITE)
     def sort(self):
         """Sort every file in the database in ascending order of time."""
+        self._merge_all_inserts()
+
         for shard_path in self._shard_paths():
-            self._sort_shard(shard_path)
+            # Day files only written by appends in time order are already sorted, so checking
+            # first usually saves rewriting them.
+            if not self._shard_is_sorted(shard_path):
+                self._sort_shard(shard_path)
+
+    def _shard_is_sorted(self, shard_path):
+        """Check whether a day file's lines are in the order :meth:`._sort_shard` would put them.
+
+        The lines' times are compared a block at a time without being parsed. Every line is
+        checked to start with a time, even once the file is known to be unsorted, since
+        :meth:`._system_sort` doesn't check them.
+        """
+        line_time_key = self._line_time_key
+        is_sorted = True
+        last_key = ""
+
+        for _, lines in self._iter_shard_blocks(self._shard_date(shard_path)):
+            keys = [last_key]
+            keys.extend(map(line_time_key, lines))
+
+            if is_sorted and not all(map(le, keys, islice(keys, 1, None))):
+                is_sorted = False
+
+            last_key = keys[-1]
+
+        return is_sorted
 
     def _sort_shard(self, shard_path):
         """Sort day file.
 
-        This works best for almost-sorted files. The algorithm is essentially a memory-efficient
-        heapsort.
+        This is an external merge sort: runs of up to :data:`SORT_RUN_LINES` lines are sorted in
+        memory and written to temporary files, which are then merged into the sorted day file.
+        Memory use and the number of temporary files are therefore bounded however unsorted the
+        file is. Day files that fit in a single run are written straight to the result.
 
-        Like all heapsorts, this is not stable. Measurements made at identical times may be swapped
-        in the sorted file.
+        Day files of at least :data:`SYSTEM_SORT_MIN_SIZE` bytes are instead sorted with the
+        system's ``sort`` command where available, which is about twice as fast.
+
+        The sort is stable. Measurements made at identical times keep their order.
         """
         # Open a temporary file to use for the sorted result.
         fp_existing, fp_temp = self._shard_stream_with_tmp_buffer(
@@ -206,89 +607,156 @@ class DirectoryDriver:
         # Ensure buffered data is written.
         fp_existing.flush()
 
-        def subsort_file(fp):
-            """Sort a file using heapsort.
-
-            Returns a list of sorted, open temporary file pointers.
-            """
-            # Open two files: one for sorted lines, one for unsorted. The sorted file is not deleted
-            # on close, but rather deleted later when we merge it into the main file. The unsorted
-            # file is deleted at the end of this method.
-            with NamedTemporaryFile(
-                mode="r+",
-                prefix=f"{fp_existing.name}_sorted",
-                dir=str(shard_path.parent),
-                delete=False,
-                encoding=self.encoding,
-            ) as sub_fp_sorted, NamedTemporaryFile(
-                mode="r+",
-                prefix=f"{fp_existing.name}_unsorted",
-                dir=str(shard_path.parent),
-                delete=True,
-                encoding=self.encoding,
-            ) as sub_fp_unsorted:
-                last_time = None
-                has_unsorted = False
-
-                for line in self._read_lines(fp):
-                    line_time, line_data = self._parse_line_time(line)
-
-                    # Choose whether to write this line into the sorted or unsorted file.
-                    if last_time is None or line_time > last_time:
-                        target = sub_fp_sorted
-                        # Update the last sorted time.
-                        last_time = line_time
-                    else:
-                        target = sub_fp_unsorted
-                        has_unsorted = True
-
-                    target.write(self._format_line(line_time, line_data))
-
-                sorted_paths = [Path(sub_fp_sorted.name)]
-
-                if has_unsorted:
-                    # Sort the unsorted heap.
-                    sorted_paths.extend(subsort_file(sub_fp_unsorted))
-
-                return sorted_paths
-
-        heap_paths = subsort_file(fp_existing)
-        # Open the heap files for reading.
-        heap_files = [
-            heap_path.open(encoding=self.encoding) for heap_path in heap_paths
-        ]
-        # Merge the sorted subfiles and write to buffer.
-        merged_lines = merge(*heap_files, key=self._parse_line_time)
-        fp_temp.writelines(merged_lines)
-
-        # Delete the temporary files.
-        for heap_file, heap_path in zip(heap_files, heap_paths):
-            heap_file.close()
-            heap_path.unlink()
+        size = os.fstat(fp_existing.fileno()).st_size
+
+        if size >= SYSTEM_SORT_MIN_SIZE and self._system_sort(shard_path, fp_temp):
+            self._shard_replace(fp_existing, fp_temp)
+            return
+
+        # Decode the lines a block at a time rather than one by one.
+        blocks = self._iter_shard_blocks(self._shard_date(shard_path))
+        lines = chain.from_iterable(block_lines for _, block_lines in blocks)
+        run_paths = []
+
+        try:
+            # The lines are written back verbatim, so they're compared by their time text without
+            # being parsed.
+            run = list(islice(lines, SORT_RUN_LINES))
+
+            while run:
+                run.sort(key=self._line_time_key)
+                next_run = list(islice(lines, SORT_RUN_LINES))
+
+                if not run_paths and not next_run:
+                    # There's only one run, so it doesn't need merging (and reparsing).
+                    fp_temp.write(("\n".join(run) + "\n").encode(self.encoding))
+                    break
+
+                # The run is deleted once it has been merged into the sorted file.
+                with NamedTemporaryFile(
+                    mode="w",
+                    prefix=f"{shard_path.name}_run",
+                    dir=str(shard_path.parent),
+                    delete=False,
+                    encoding=self.encoding,
+                ) as fp_run:
+                    run_paths.append(Path(fp_run.name))
+                    fp_run.write("\n".join(run))
+                    fp_run.write("\n")
+
+                run = next_run
+
+            run_files = [
+                run_path.open(encoding=self.encoding) for run_path in run_paths
+            ]
+
+            try:
+                # Merge the sorted runs and write to the buffer. Only the times are compared, so
+                # that lines at identical times are taken from earlier runs first. The merge
+                # computes each line's key once, when the line is read from its run.
+                merged_lines = merge(*run_files, key=self._line_time_key)
+
+                # Encode and write the merged lines in batches rather than one by one.
+                while True:
+                    batch = "".join(islice(merged_lines, SORT_RUN_LINES))
+
+                    if not batch:
+                        break
+
+                    fp_temp.write(batch.encode(self.encoding))
+            finally:
+                for run_file in run_files:
+                    run_file.close()
+        finally:
+            # Delete the runs.
+            for run_path in run_paths:
+                run_path.unlink()
 
         # Overwrite the unsorted shard with the buffer.
         self._shard_replace(fp_existing, fp_temp)
 
-    def _format_line(self, tick_time, data):
-        return " ".join([str(tick_time)] + self._format_data(data)) + "\n"
+    @staticmethod
+    def _system_sort(shard_path, fp_temp):
+        """Sort a day file into a temporary buffer with the system's ``sort`` command.
+
+        Lines are sorted stably by their first field, compared byte by byte. This matches the
+        order of the times as long as they are written with the same UTC offset (or none).
+
+        Returns
+        -------
+        :class:`bool`
+            True if the day file was sorted, or False if ``sort`` is unavailable or failed, in
+            which case the buffer is left empty.
+        """
+        sort_path = shutil.which("sort")
+
+        if sort_path is None:
+            return False
+
+        try:
+            subprocess.run(
+                [sort_path, "-s", "-k", "1,1", "-o", fp_temp.name, str(shard_path)],
+                env={**os.environ, "LC_ALL": "C"},
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                check=True,
+            )
+        except (OSError, subprocess.CalledProcessError):
+            # Not a POSIX sort (e.g. on Windows). Discard any partial output.
+            fp_temp.seek(0)
+            fp_temp.truncate()
+            return False
+
+        return True
 
     def _shard_path(self, date):
-        return (
-            self.path / f"{date.year:04d}" / f"{date.month:02d}" / f"{date.day:02d}.txt"
-        )
+        # Joining paths is slow relative to the rest of an append, so each day's path is only built
+        # once. Reusing the same object also means its hash is only computed once when it's used
+        # as a cache key.
+        try:
+            return self._path_cache[date]
+        except KeyError:
+            shard_path = self._path_cache[date] = self.path.joinpath(
+                f"{date.year:04d}/{date.month:02d}/{date.day:02d}{self.SHARD_SUFFIX}"
+            )
+            return shard_path
 
     def _shard_paths(self):
-        return self.path.glob("**/*.txt")
+        return self.path.glob(f"**/*{self.SHARD_SUFFIX}")
+
+    def _shard_dates(self):
+        """Get the dates of all day files, including compressed ones, in ascending order."""
+        shard_paths = set(self._shard_paths())
+        shard_paths.update(
+            compressed_path.with_suffix("")
+            for compressed_path in self.path.glob(f"**/*{self.SHARD_SUFFIX}.gz")
+        )
+
+        return sorted(self._shard_date(shard_path) for shard_path in shard_paths)
+
+    @staticmethod
+    def _shard_date(shard_path):
+        return date(
+            int(shard_path.parent.parent.name),
+            int(shard_path.parent.name),
+            int(shard_path.stem),
+        )
+
+    @staticmethod
+    def _compressed_path(shard_path):
+        return shard_path.with_name(f"{shard_path.name}.gz")
 
     @staticmethod
-    def _read_lines(fp, reverse=False, buf_size=8192):
-        """Memory-efficient, reversible line reader.
+    def _read_lines(fp, reverse=False, buf_size=8192, offset=None):
+        """Memory-efficient, reversible line reader for binary streams.
 
         Based on flyingcircus.readline.
+
+        Lines are read forwards from the start of the file, or backwards from `offset` (by
+        default, the end of the file) if `reverse` is set. Lines are returned undecoded.
         """
-        is_bytes = isinstance(fp.read(0), bytes)
-        newline = b"\n" if is_bytes else "\n"
-        remainder = b"" if is_bytes else ""
+        remainder = b""
 
         def blocks(fp):
             fp.seek(0)
@@ -302,12 +770,16 @@ class DirectoryDriver:
                 yield block
 
         def reversed_blocks(fp):
-            offset = fp.seek(0, os.SEEK_END)
-
-            while offset > 0:
-                block_size = min(offset, buf_size)
-                offset -= block_size
-                fp.seek(offset)
+            if offset is None:
+                fp.seek(0, os.SEEK_END)
+                position = fp.tell()
+            else:
+                position = offset
+
+            while position > 0:
+                block_size = min(position, buf_size)
+                position -= block_size
+                fp.seek(position)
                 block = fp.read(block_size)
 
                 yield block
@@ -315,7 +787,7 @@ class DirectoryDriver:
         block_generator = reversed_blocks if reverse else blocks
 
         for block in block_generator(fp):
-            lines = block.split(newline)
+            lines = block.split(b"\n")
 
             if remainder:
                 if not reverse:
@@ -333,150 +805,1534 @@ class DirectoryDriver:
         if remainder:  # Ignores empty last line.
             yield remainder
 
-    def _parse_lines(self, shard_date, start, stop, reverse=False):
+    def _seek_shard_time(self, shard_path, fp, target_time, after=False):
+        """Find the first line in a day file with a time not earlier than `target_time` (or later
+        than it, if `after` is set).
+
+        The search is narrowed using the day file's index, if it has a valid one.
+        """
+        lo, hi = self._index_window(
+            shard_path, fp, time_to_us(target_time), after=after
+        )
+
+        return self._seek_time(fp, target_time, lo, hi, after=after)
+
+    def _seek_time(self, fp, target_time, lo=0, hi=None, after=False):
+        """Find the first line in a binary stream or memory map with a time not earlier than
+        `target_time` (or later than it, if `after` is set).
+
+        This is a binary search over byte offsets, so the file must be sorted. The search can be
+        limited to the lines starting in [`lo`, `hi`) if it is known that the lines before `lo`
+        don't match and the lines from `hi` onwards do.
+
+        Returns
+        -------
+        :class:`int`
+            The offset of the start of the line, or the file size if no such line exists.
+        """
+        # All lines starting before `lo` don't match, and all lines starting at or after `hi` do.
+        # `lo` is always at the start of a line.
+        if hi is None:
+            fp.seek(0, os.SEEK_END)
+            hi = fp.tell()
+
+        while lo < hi:
+            mid = (lo + hi) // 2
+
+            # Find the start of the first line at or after `mid`.
+            if mid == 0:
+                fp.seek(0)
+                position = 0
+            else:
+                fp.seek(mid - 1)
+                fp.readline()
+                position = fp.tell()
+
+            line = fp.readline()
+
+            while line and not line.strip():
+                # Skip empty lines.
+                position += len(line)
+                line = fp.readline()
+
+            if not line or position >= hi:
+                # No line starts in [mid, hi).
+                hi = mid
+                continue
+
+            line_time, _ = self._parse_line_head(line.decode(self.encoding))
+
+            if line_time < target_time or (after and line_time == target_time):
+                lo = position + len(line)
+            else:
+                hi = position
+
+        return lo
+
+    def _prefetch(self, shard_date):
+        """Hint to the operating system that the specified day file will soon be read.
+
+        This is a no-op on platforms without :py:func:`os.posix_fadvise`.
+        """
+        if not hasattr(os, "posix_fadvise"):
+            return
+
         shard_path = self._shard_path(shard_date)
 
+        if shard_path in self._file_cache:
+            return
+
         try:
+            # Open the file through the file cache, so it's already open when it's read.
             fp = self._shard_stream(shard_path, DriverAccessType.READ)
         except FileNotFoundError:
-            # No file, so nothing to read.
+            # Nothing to prefetch.
             return
 
-        for lineno, line in enumerate(self._read_lines(fp, reverse=reverse), start=1):
-            try:
-                line_time, line_data = self._parse_line_time(line)
-            except ValueError as e:
-                if reverse:
-                    e.args = (f"{e} (line -{lineno} of {self})",)
-                else:
-                    e.args = (f"{e} (line {lineno} of {self})",)
-                raise e
+        os.posix_fadvise(fp.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
 
-            if (reverse and line_time < start) or (not reverse and line_time >= stop):
-                break
+    def _query_shard(self, shard_date, windows, reverse=False):
+        """Parse the lines of a day file lying in any of the specified half-open intervals.
 
-            if (reverse and line_time < stop) or (not reverse and line_time >= start):
-                line_datetime = datetime.combine(shard_date, line_time)
-                yield [line_datetime, self._parse_data(line_data)]
+        The (start, stop) windows must not overlap, and must be in ascending order (or descending
+        order, if `reverse` is set).
 
-    @staticmethod
-    def _parse_line_time(line):
-        """Parse line time and return it along with the raw line data."""
-        pieces = line.split()
-        assert len(pieces) >= 2
-        return time.fromisoformat(pieces[0]), pieces[1:]
+        Day files lying entirely outside a window are skipped without being parsed. Each line's
+        time is only checked when the end of the window at which reading stops falls within the
+        day file; otherwise the lines are read from the start of the window without checks.
+        """
+        bounds = self._shard_bounds(shard_date)
 
-    def _shard_stream(self, shard_path, mode=DriverAccessType.READ, create=False):
-        if not self._is_open:
-            raise ProgrammingError(
-                f"{self} is not open. Data can only be queried when the driver is open and in read "
-                f"mode."
-            )
+        if bounds is None:
+            # No data.
+            return
 
-        file_mode = DriverAccessType.file_mode(mode)
+        first_time, last_time = bounds
 
-        if shard_path in self._file_cache:
-            if self._file_cache[shard_path].mode == file_mode:
-                # We're done.
-                return self._file_cache[shard_path]
-
-            # Not the correct mode. Close and reopen.
-            self._file_cache[shard_path].close()
-        elif create and not shard_path.is_file():
-            shard_path.parent.mkdir(exist_ok=True, parents=True)
-            shard_path.touch(exist_ok=False)
-
-        self._file_cache[shard_path] = shard_path.open(
-            file_mode, encoding=self.encoding
-        )
+        for start, stop in windows:
+            if last_time < start or first_time >= stop:
+                continue
 
-        return self._file_cache[shard_path]
+            if reverse and first_time >= start:
+                seek_time = stop if last_time >= stop else None
+                yield from self._parse_lines_all(
+                    shard_date, reverse=True, seek_time=seek_time
+                )
+            elif not reverse:
+                # Both ends of the window are found by bisection, so the lines in between are
+                # parsed in bulk without checking their times.
+                yield from self._parse_lines_all(
+                    shard_date,
+                    seek_time=start if first_time < start else None,
+                    stop_time=stop if last_time >= stop else None,
+                )
+            else:
+                yield from self._parse_lines_reversed(shard_date, start, stop)
 
-    def _shard_stream_with_tmp_buffer(self, shard_path, *args, **kwargs):
-        """Get two shard streams for a given date: the real one, and a temporary buffer.
+    def _query_shard_columns(self, shard_date, start, stop):
+        """Parse the lines of a day file lying in the half-open interval [`start`, `stop`) into
+        columns.
 
-        The real shard stream is the same one returned by :class:`._shard_stream`. The temporary one
-        has the same path and filename except with ".tmp" appended. The temporary buffer is
-        write-only, and it is up to the user to delete the file if/when needed.
+        The lines are read in one block and split into columns in bulk, rather than parsed line
+        by line. Every line must have the same number of columns.
+
+        Returns
+        -------
+        :class:`tuple` or None
+            The unparsed time of day of each line as a list of :class:`str` and the data columns as
+            parsed by the device, or None if there are no lines in the interval.
         """
-        fp_real = self._shard_stream(shard_path, *args, **kwargs)
-        fp_temp = NamedTemporaryFile(
-            mode="w", prefix=shard_path.name, dir=str(shard_path.parent), delete=False
-        )
+        bounds = self._shard_bounds(shard_date)
 
-        return fp_real, fp_temp
+        if bounds is None:
+            # No data.
+            return None
 
-    def _shard_replace(self, fp_cached, fp_replacement):
-        """Rename the file `fp_replacement` represents to the path that `fp_cached` represents.
+        first_time, last_time = bounds
 
-        The renamed file is cached and reopened in the same mode as the file that `fp_cached`
-        represents. Both file pointers are closed by this method.
-        """
-        cached_path = Path(fp_cached.name)
+        if last_time < start or first_time >= stop:
+            return None
 
-        assert cached_path in self._file_cache
-        assert not fp_cached.closed
-        assert cached_path == Path(fp_cached.name)
+        fp = self._shard_view(self._shard_path(shard_date))
 
-        replacement_path = Path(fp_replacement.name)
+        # Find the byte range to read.
+        shard_path = self._shard_path(shard_date)
+        lo = 0 if first_time >= start else self._seek_shard_time(shard_path, fp, start)
+        hi = (
+            self._view_size(fp)
+            if last_time < stop
+            else self._seek_shard_time(shard_path, fp, stop)
+        )
 
-        # Close the files.
-        fp_cached.close()
-        fp_replacement.close()
+        if lo >= hi:
+            return None
 
-        # Both files should still exist.
-        assert cached_path.is_file()
-        assert replacement_path.is_file()
+        fp.seek(lo)
+        block = fp.read(hi - lo).decode(self.encoding)
+        nrows = sum(1 for line in block.split("\n") if line)
+        tokens = block.split()
+        stride = len(tokens) // nrows
 
-        # Rename.
-        replacement_path.rename(cached_path)
+        if stride < 2 or stride * nrows != len(tokens):
+            raise ValueError(
+                f"lines of {self} on {shard_date} don't all have the same number of columns"
+            )
 
-        # Re-open with the original mode.
-        self._file_cache[cached_path] = cached_path.open(
-            fp_cached.mode, encoding=self.encoding
+        columns = self._parse_columns(
+            [tokens[column::stride] for column in range(1, stride)]
         )
 
-    def __str__(self):
-        return f"{self.__class__.__name__}(access_type={self.access_type})"
+        return tokens[::stride], columns
 
+    def _shard_bounds(self, shard_date):
+        """Get the times of the first and last lines in a day file.
 
-class Cursor(Reversible, Iterable):
-    """Query result cursor."""
+        The bounds are cached until the file changes, whether written by this driver or another.
 
-    def __init__(self, driver):
-        self._driver = driver
-        self.query_intervals = {}
+        Returns
+        -------
+        :class:`tuple` or None
+            The first and last times, or None if the file doesn't exist or is empty.
+        """
+        shard_path = self._shard_path(shard_date)
+        version = self._shard_version(shard_path)
 
-    @classmethod
-    def from_range(cls, driver, start, stop):
-        """Build a Cursor from a driver and datetime interval."""
-        cursor = cls(driver)
+        if version is None:
+            # No data.
+            return None
+
+        try:
+            cached_version, bounds = self._bounds_cache[shard_path]
+        except KeyError:
+            pass
+        else:
+            if cached_version == version:
+                return bounds
 
-        if start > stop:
-            raise ValueError(f"start ({start}) cannot be > stop ({stop})")
+        try:
+            if shard_path in self._expanded_views or os.path.exists(shard_path):
+                bounds = self._read_shard_bounds(shard_path)
+            else:
+                # Stream through a compressed day rather than holding all of it in memory.
+                bounds = self._read_compressed_bounds(shard_path)
+        except FileNotFoundError:
+            # Removed since it was checked.
+            return None
 
-        start_date = start.date()
-        stop_date = stop.date()
+        self._bounds_cache[shard_path] = version, bounds
 
-        # Calculate the delta based on the dates, not datetimes, to avoid problems with end times
-        # before start times on different dates.
-        delta = stop_date - start_date
+        return bounds
 
-        for day_offset in range(delta.days + 1):
-            shard_date = start_date + timedelta(days=day_offset)
+    def _shard_version(self, shard_path):
+        """Identify the current contents of a day file, or of its compressed copy.
 
-            # Set the query's time span for the day.
-            query_start = start.time() if start_date == shard_date else time.min
-            query_stop = stop.time() if stop_date == shard_date else time.max
+        Returns
+        -------
+        :class:`tuple` or None
+            The inode, size and modification time of the file, or None if it doesn't exist.
+        """
+        for path in (shard_path, self._compressed_path(shard_path)):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
 
-            cursor.query_intervals[shard_date] = query_start, query_stop
+            return stat.st_ino, stat.st_size, stat.st_mtime_ns
 
-        return cursor
+        return None
+
+    def _read_shard_bounds(self, shard_path):
+        """Read the times of the first and last lines in a day file, or None if it's empty."""
+        fp = self._shard_view(shard_path)
+        first_line = next(self._read_lines(fp), None)
+
+        if first_line is None:
+            return None
+
+        # The last line is read backwards from the end, usually in a single small block.
+        last_line = next(self._read_lines(fp, reverse=True, buf_size=256))
+        first_time, _ = self._parse_line_head(first_line.decode(self.encoding))
+        last_time, _ = self._parse_line_head(last_line.decode(self.encoding))
+
+        return first_time, last_time
+
+    def _read_compressed_bounds(self, shard_path):
+        """Read the times of the first and last lines in a compressed day file, or None if it's
+        empty."""
+        with gzip.open(self._compressed_path(shard_path), "rb") as fp:
+            first_line = fp.readline()
+
+            if not first_line:
+                return None
+
+            last_line = next(iter(deque(fp, maxlen=1)), first_line)
+
+        first_time, _ = self._parse_line_head(first_line.decode(self.encoding))
+        last_time, _ = self._parse_line_head(last_line.decode(self.encoding))
+
+        return first_time, last_time
+
+    def _parse_lines_reversed(self, shard_date, start, stop):
+        """Parse the lines of a day file lying in the half-open interval [`start`, `stop`), from
+        last to first."""
+        # Jump straight to the last line to read rather than scanning back to it, so that only the
+        # start of the interval has to be checked. The data of each line is only split once the
+        # line is known to be in the interval.
+        parse_data = self._parse_data
+
+        for line_time, line_tail in self._iter_shard_lines_reversed(shard_date, stop):
+            if line_time < start:
+                break
+
+            line_datetime = datetime.combine(shard_date, line_time)
+            yield [line_datetime, parse_data(line_tail.split())]
+
+    def _parse_lines_all(
+        self, shard_date, reverse=False, seek_time=None, stop_time=None
+    ):
+        parse_data = self._parse_data
+
+        if reverse:
+            lines = self._iter_shard_lines_reversed(shard_date, seek_time)
+
+            for line_time, line_tail in lines:
+                yield [
+                    datetime.combine(shard_date, line_time),
+                    parse_data(line_tail.split()),
+                ]
+
+            return
+
+        # Forwards, every line up to the stop is needed, so the lines are decoded and parsed a
+        # block at a time in a single comprehension rather than through the line reader. Parsing
+        # each datetime in one go is quicker than parsing the time and combining it with the date.
+        date_prefix = f"{shard_date.isoformat()}T"
+        fromisoformat = datetime.fromisoformat
+
+        blocks = self._iter_shard_blocks(
+            shard_date, seek_time=seek_time, stop_time=stop_time
+        )
+
+        for offset, lines in blocks:
+            try:
+                rows = [
+                    [
+                        fromisoformat(date_prefix + line_head),
+                        parse_data(line_tail.split()),
+                    ]
+                    for line_head, line_tail in (line.split(None, 1) for line in lines)
+                ]
+            except ValueError as e:
+                e.args = (
+                    f"{e} (in lines from byte {offset} of {self} on {shard_date})",
+                )
+                raise e
+
+            yield from rows
+
+    def _iter_shard_blocks(
+        self, shard_date, seek_time=None, stop_time=None, buf_size=1 << 16
+    ):
+        """Generate the lines of a day file a block at a time.
+
+        If `seek_time` is given, lines are read from the first line not earlier than it. If
+        `stop_time` is given, lines are read up to the last line earlier than it.
+
+        Yields
+        ------
+        :class:`tuple`
+            The byte offset of each block, and its decoded non-empty lines.
+        """
+        shard_path = self._shard_path(shard_date)
+
+        try:
+            fp = self._shard_view(shard_path)
+        except FileNotFoundError:
+            # No file, so nothing to read.
+            return
+
+        if seek_time is None:
+            offset = 0
+        else:
+            offset = self._seek_shard_time(shard_path, fp, seek_time)
+
+        if stop_time is None:
+            end = self._view_size(fp)
+        else:
+            end = self._seek_shard_time(shard_path, fp, stop_time)
+
+        encoding = self.encoding
+        remainder = b""
+        fp.seek(offset)
+
+        while True:
+            block = fp.read(max(min(buf_size, end - offset - len(remainder)), 0))
+
+            if not block:
+                break
+
+            # Carry any partial last line over to the next block.
+            block = remainder + block
+            cut = block.rfind(b"\n") + 1
+            remainder = block[cut:]
+
+            yield offset, [
+                line for line in block[:cut].decode(encoding).split("\n") if line
+            ]
+
+            offset += cut
+
+        if remainder.strip():  # Ignores empty last line.
+            yield offset, [remainder.decode(encoding)]
+
+    def _iter_shard_lines_reversed(self, shard_date, seek_time=None):
+        """Generate the time and unsplit data of each line in a day file, from last to first.
+
+        If `seek_time` is given, lines are read from the last line earlier than it.
+        """
+        shard_path = self._shard_path(shard_date)
+
+        try:
+            fp = self._shard_view(shard_path)
+        except FileNotFoundError:
+            # No file, so nothing to read.
+            return
+
+        if seek_time is None:
+            offset = None
+        else:
+            offset = self._seek_shard_time(shard_path, fp, seek_time)
+        lines = self._read_lines(fp, reverse=True, offset=offset)
+        where = f"{self}" if offset is None else f"{self} from byte {offset}"
+
+        encoding = self.encoding
+        parse_line_head = self._parse_line_head
+
+        for lineno, line in enumerate(lines, start=1):
+            try:
+                yield parse_line_head(line.decode(encoding))
+            except ValueError as e:
+                e.args = (f"{e} (line -{lineno} of {where})",)
+                raise e
+
+    @staticmethod
+    def _times_to_datetimes(shard_date, times):
+        """Convert the times returned by :meth:`._query_shard_columns` to datetimes."""
+        date_prefix = f"{shard_date.isoformat()}T"
+        return [datetime.fromisoformat(date_prefix + value) for value in times]
+
+    @staticmethod
+    def _times_to_us(shard_date, times):
+        """Convert the times returned by :meth:`._query_shard_columns` to microseconds since
+        1970-01-01T00:00."""
+        day_us = (shard_date - EPOCH_DATE).days * US_PER_DAY
+        return [day_us + time_to_us(time.fromisoformat(value)) for value in times]
+
+    def _reader_factory(self):
+        """Get a picklable function that opens a new reader of the same data.
+
+        This is used to read in worker processes.
+        """
+        return partial(
+            DirectoryDriver,
+            self.path,
+            DriverAccessType.READ,
+            self.encoding,
+            None,
+            self._parse_data,
+            None,
+        )
+
+    @staticmethod
+    def _parse_line_head(line):
+        """Parse line time and return it along with the unsplit rest of the line.
+
+        This is cheaper than splitting the whole line when the line's data may not be needed.
+        """
+        pieces = line.split(None, 1)
+
+        if len(pieces) < 2:
+            raise ValueError(f"no data in line {line!r}")
+
+        return time.fromisoformat(pieces[0]), pieces[1]
+
+    @staticmethod
+    def _line_time_key(line):
+        """Get a sort key for a line's time without parsing it.
+
+        Times are written in ISO format, so their text sorts in time order as long as they're
+        written with the same UTC offset (or none). This is the same order as
+        :meth:`._system_sort`.
+
+        Raises
+        ------
+        :class:`ValueError`
+            If the line doesn't start with a time.
+        """
+        key = line.partition(" ")[0]
+
+        if not _match_plain_time(key):
+            # Not a plain HH:MM:SS[.ffffff] time, so check it's a time at all.
+            DirectoryDriver._parse_line_head(line)
+
+        return key
+
+    def _shard_stream(self, shard_path, mode=DriverAccessType.READ, create=False):
+        if not self._is_open:
+            raise ProgrammingError(
+                f"{self} is not open. Data can only be queried when the driver is open and in read "
+                f"mode."
+            )
+
+        file_mode = _FILE_MODES[mode]
+
+        if mode is not DriverAccessType.READ:
+            # The file may be about to change.
+            self._bounds_cache.pop(shard_path, None)
+
+        cached = self._file_cache.get(shard_path)
+
+        if cached is not None:
+            if cached.mode == file_mode:
+                # We're done. Mark the file as the most recently used.
+                self._file_cache.move_to_end(shard_path)
+                return cached
+
+            # Not the correct mode. Write any pending appends, then close and reopen.
+            self._close_shard(shard_path)
+
+        # Try to open the file before checking whether it exists, since it usually does.
+        try:
+            fp = self._open_shard(shard_path, file_mode)
+        except FileNotFoundError:
+            if not create:
+                raise
+
+            if self._compressed_path(shard_path).is_file():
+                self._expand_shard(shard_path)
+            else:
+                shard_path.parent.mkdir(exist_ok=True, parents=True)
+                shard_path.touch()
+
+            fp = self._open_shard(shard_path, file_mode)
+
+        # Only make room once the file is open, so that looking for a missing day (e.g. over a gap
+        # in the data) doesn't close a file that's still in use.
+        while len(self._file_cache) >= MAX_OPEN_SHARDS:
+            # Close the least recently used file.
+            self._evict_shard(next(iter(self._file_cache)))
+
+        self._file_cache[shard_path] = fp
+
+        return fp
+
+    @staticmethod
+    def _open_shard(shard_path, file_mode):
+        """Open a day file in binary mode, without creating it if it doesn't exist.
+
+        Day files are always read and written as bytes, and encoded and decoded by the driver.
+        """
+        if file_mode == "ab":
+            # Appends are buffered and encoded by the driver, so write straight to the file
+            # descriptor rather than through another buffer. Opening in append mode would create
+            # a missing file, which must instead be restored if it has been compressed.
+            return open(
+                shard_path,
+                file_mode,
+                buffering=0,
+                opener=lambda path, flags: os.open(path, flags & ~os.O_CREAT),
+            )
+
+        return shard_path.open(file_mode)
+
+    @staticmethod
+    def _index_path(shard_path):
+        return shard_path.with_name(f"{shard_path.name}.idx")
+
+    @staticmethod
+    def _read_index(index_path):
+        """Read a day file's index.
+
+        The index is a sequence of little-endian int64 pairs: the time of a line in microseconds
+        since midnight, and the line's byte offset.
+
+        Returns
+        -------
+        :class:`array.array`
+            The flattened (time, offset) pairs. This is empty if the index doesn't exist or is
+            corrupt.
+        """
+        entries = array("q")
+
+        try:
+            entries.frombytes(index_path.read_bytes())
+        except (FileNotFoundError, ValueError):
+            # No index, or a partially written record.
+            return array("q")
+
+        if sys.byteorder == "big":
+            entries.byteswap()
+
+        return entries
+
+    def _shard_index(self, shard_path):
+        """Get the times and offsets of a day file's index entries.
+
+        The index is read once and cached until the driver updates it or is closed, so repeated
+        queries of the same day don't read it again.
+
+        Returns
+        -------
+        :class:`tuple`
+            The times and offsets, as :class:`array.array`.
+        """
+        try:
+            return self._index_cache[shard_path]
+        except KeyError:
+            pass
+
+        entries = self._read_index(self._index_path(shard_path))
+        index = self._index_cache[shard_path] = entries[0::2], entries[1::2]
+
+        return index
+
+    def _index_window(self, shard_path, fp, target_us, after=False):
+        """Use a day file's index to find the range of lines that may contain the first line not
+        earlier than `target_us` (or later than it, if `after` is set).
+
+        Returns
+        -------
+        :class:`tuple`
+            The offsets that bound the search, suitable for :meth:`._seek_time`. The whole file is
+            returned if there is no valid index.
+        """
+        fp.seek(0, os.SEEK_END)
+        size = fp.tell()
+        times, offsets = self._shard_index(shard_path)
+
+        # Ignore entries for data we can't see (e.g. written after we opened the file).
+        nentries = bisect_left(offsets, size)
+        position = (bisect_right if after else bisect_left)(
+            times, target_us, 0, nentries
+        )
+        lo, hi = 0, size
+
+        if position > 0:
+            lo = offsets[position - 1]
+
+            if not self._index_entry_valid(fp, times[position - 1], lo):
+                return 0, size
+
+        if position < nentries:
+            hi = offsets[position]
+
+            if not self._index_entry_valid(fp, times[position], hi):
+                return 0, size
+
+        return lo, hi
+
+    def _index_entry_valid(self, fp, time_us, offset):
+        """Check that an index entry points to the start of a line with the recorded time.
+
+        Entries can be invalidated by editing the day file outside of TaransayDB.
+        """
+        if offset > 0:
+            fp.seek(offset - 1)
+
+            if fp.read(1) != b"\n":
+                return False
+        else:
+            fp.seek(0)
+
+        try:
+            line_time, _ = self._parse_line_head(fp.readline().decode(self.encoding))
+        except ValueError:
+            return False
+
+        return time_to_us(line_time) == time_us
+
+    def _update_indexes(self):
+        for shard_path in self._unindexed_shards:
+            self._update_index(shard_path)
+
+        self._unindexed_shards.clear()
+
+    def _update_index(self, shard_path, rebuild=False):
+        """Add entries to a day file's index for the data after its last entry.
+
+        The index records the time and offset of the first line after each multiple of
+        :data:`INDEX_STRIDE` bytes. Data appended to a day file doesn't change the offsets of
+        earlier lines, so existing entries remain valid. If the earlier data has changed,
+        `rebuild` must be set.
+        """
+        index_path = self._index_path(shard_path)
+        self._index_cache.pop(shard_path, None)
+        entries = array("q") if rebuild else self._read_index(index_path)
+        new_entries = array("q")
+        next_offset = entries[-1] + INDEX_STRIDE if entries else INDEX_STRIDE
+
+        with shard_path.open("rb") as fp:
+            size = os.fstat(fp.fileno()).st_size
+
+            while next_offset < size:
+                # Find the start of the first line at or after the offset.
+                fp.seek(next_offset - 1)
+                fp.readline()
+                position = fp.tell()
+                line = fp.readline()
+
+                if not line:
+                    break
+
+                next_offset = position + INDEX_STRIDE
+
+                if not line.strip():
+                    continue
+
+                try:
+                    line_time, _ = self._parse_line_head(line.decode(self.encoding))
+                except ValueError:
+                    # An index can't be trusted for a file that can't be parsed.
+                    try:
+                        index_path.unlink()
+                    except FileNotFoundError:
+                        pass
+
+                    return
+
+                new_entries.extend((time_to_us(line_time), position))
+
+        if not new_entries:
+            if rebuild:
+                # The file is too short to need an index, so don't leave an empty one.
+                try:
+                    index_path.unlink()
+                except FileNotFoundError:
+                    pass
+
+            return
+
+        if sys.byteorder == "big":
+            new_entries.byteswap()
+
+        with index_path.open("wb" if rebuild else "ab") as fp:
+            fp.write(new_entries.tobytes())
+
+    def _shard_view(self, shard_path):
+        """Get a read-only memory map of a day file.
+
+        Reading lines through a memory map avoids a system call per block, and seeking within it
+        is free. The map is cached along with the underlying read stream, and remapped if the file
+        has since grown (e.g. by another process appending to it).
+
+        Returns
+        -------
+        :class:`mmap.mmap` or file object
+            The memory map, the read stream if the file is empty (and therefore can't be mapped),
+            or an in-memory copy of a compressed day file. All support the file methods used by
+            the line readers.
+        """
+        view = self._view_cache.get(shard_path)
+
+        if view is not None:
+            fp = self._file_cache[shard_path]
+            size = os.fstat(fp.fileno()).st_size
+
+            if size == len(view):
+                return view
+
+            # The old map isn't closed, since a suspended query may still be reading from it. Any
+            # cached index may also be out of date.
+            del self._view_cache[shard_path]
+            self._index_cache.pop(shard_path, None)
+        elif shard_path in self._expanded_views:
+            self._expanded_views.move_to_end(shard_path)
+            return self._expanded_views[shard_path]
+        else:
+            try:
+                fp = self._shard_stream(shard_path, DriverAccessType.READ)
+            except FileNotFoundError:
+                # Fall back to the compressed day file, if there is one.
+                return self._expanded_view(shard_path)
+
+            size = os.fstat(fp.fileno()).st_size
+
+        if not size:
+            return fp
+
+        view = self._view_cache[shard_path] = mmap.mmap(
+            fp.fileno(), 0, access=mmap.ACCESS_READ
+        )
+
+        return view
+
+    def _expanded_view(self, shard_path):
+        """Decompress a compressed day file into memory.
+
+        Only the :data:`MAX_EXPANDED_SHARDS` most recently used copies are kept, so that scanning
+        compressed history doesn't hold more than a few days in memory.
+        """
+        with gzip.open(self._compressed_path(shard_path), "rb") as fp_compressed:
+            view = io.BytesIO(fp_compressed.read())
+
+        while len(self._expanded_views) >= MAX_EXPANDED_SHARDS:
+            # Drop the least recently used copy. It isn't closed, since a suspended query may
+            # still be reading from it.
+            self._expanded_views.popitem(last=False)
+
+        self._expanded_views[shard_path] = view
+
+        return view
+
+    @staticmethod
+    def _view_size(view):
+        view.seek(0, os.SEEK_END)
+        return view.tell()
+
+    def _close_shard(self, shard_path):
+        """Write any pending appends to a day file and close it, if it is open."""
+        if shard_path not in self._file_cache:
+            return
+
+        self._flush_write_buffer(shard_path)
+        self._close_shard_view(shard_path)
+        self._file_cache.pop(shard_path).close()
+
+    def _evict_shard(self, shard_path):
+        """Close a day file to free up its file descriptor and page cache.
+
+        Unlike :meth:`._close_shard`, the file's memory map (if any) is only dereferenced rather
+        than closed, since a suspended query may still be reading from it.
+        """
+        self._flush_write_buffer(shard_path)
+        self._view_cache.pop(shard_path, None)
+        fp = self._file_cache.pop(shard_path)
+
+        if "r" in fp.mode and hasattr(os, "posix_fadvise"):
+            # We're not expecting to read this file again soon, so let the operating system drop
+            # it from the page cache.
+            os.posix_fadvise(fp.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+        fp.close()
+
+    def _close_shard_view(self, shard_path):
+        view = self._view_cache.pop(shard_path, None)
+
+        if view is not None:
+            view.close()
+
+    def _shard_stream_with_tmp_buffer(self, shard_path, *args, **kwargs):
+        """Get two shard streams for a given date: the real one, and a temporary buffer.
+
+        The real shard stream is the same one returned by :class:`._shard_stream`. The temporary one
+        has the same path and filename except with ".tmp" appended. The temporary buffer is
+        write-only and binary, and it is up to the user to delete the file if/when needed.
+        """
+        fp_real = self._shard_stream(shard_path, *args, **kwargs)
+        fp_temp = NamedTemporaryFile(
+            mode="wb", prefix=shard_path.name, dir=str(shard_path.parent), delete=False
+        )
+
+        return fp_real, fp_temp
+
+    @staticmethod
+    def _copy_range(fp_src, fp_dst, offset, count, buf_size=1 << 20):
+        """Copy `count` bytes from `offset` in one binary file to the current position of another.
+
+        The copy is made in kernel space where the platform supports it.
+        """
+        # Write anything buffered so that the copy lands after it.
+        fp_dst.flush()
+
+        if hasattr(os, "copy_file_range"):
+            src_fd = fp_src.fileno()
+            dst_fd = fp_dst.fileno()
+
+            while count > 0:
+                try:
+                    copied = os.copy_file_range(src_fd, dst_fd, count, offset)
+                except OSError:
+                    # Not supported between these files; copy the rest in user space.
+                    break
+
+                if not copied:
+                    # End of file.
+                    return
+
+                offset += copied
+                count -= copied
+
+        fp_src.seek(offset)
+
+        while count > 0:
+            block = fp_src.read(min(count, buf_size))
+
+            if not block:
+                break
+
+            fp_dst.write(block)
+            count -= len(block)
+
+    def _shard_replace(self, fp_cached, fp_replacement):
+        """Rename the file `fp_replacement` represents to the path that `fp_cached` represents.
+
+        The replacement is synced to disk before the rename, so that after a crash the path holds
+        either the old or the new data in full.
+
+        Both file pointers are closed by this method. The renamed file isn't reopened until it's
+        next needed, since day files are often replaced in bulk (e.g. when sorting) and then not
+        read again.
+        """
+        cached_path = Path(fp_cached.name)
+
+        assert cached_path in self._file_cache
+        assert not fp_cached.closed
+        assert cached_path == Path(fp_cached.name)
+
+        replacement_path = Path(fp_replacement.name)
+
+        # Ensure the replacement's data is on disk before it takes the cached file's place.
+        fp_replacement.flush()
+        os.fsync(fp_replacement.fileno())
+
+        # Close the files.
+        self._close_shard_view(cached_path)
+        del self._file_cache[cached_path]
+        fp_cached.close()
+        fp_replacement.close()
+
+        # Both files should still exist.
+        assert cached_path.is_file()
+        assert replacement_path.is_file()
+
+        # Atomically rename, overwriting the cached file on all platforms.
+        os.replace(replacement_path, cached_path)
+        self._bounds_cache.pop(cached_path, None)
+        self._update_index(cached_path, rebuild=True)
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(access_type={self.access_type})"
+
+
+class BinaryDirectoryDriver(DirectoryDriver):
+    """Directory-based database driver storing fixed-width binary rows of floats.
+
+    Each row of a day file is a little-endian signed 64-bit integer holding the time of day in
+    microseconds, followed by a 64-bit float for each of the `ncols` data columns. Since the rows
+    have a fixed width, they are searched directly without an index, and read without parsing.
+    Time zone information is not stored.
+    """
+
+    SHARD_SUFFIX = ".bin"
+    """File name suffix of day files."""
+
+    def __init__(self, path, access_type, ncols):
+        super().__init__(path, access_type, None, None, None, None)
+        self.ncols = ncols
+        self._record = struct.Struct("<q" + "d" * ncols)
+
+    def _encode_line(self, tick_time, data):
+        try:
+            return self._record.pack(time_to_us(tick_time), *data)
+        except struct.error as e:
+            raise ValueError(
+                f"{self} stores {self.ncols} float columns, but got {data!r}"
+            ) from e
+
+    def _encode_lines(self, rows):
+        encode_line = self._encode_line
+        return b"".join([encode_line(tick_time, data) for tick_time, data in rows])
+
+    def _read_records(self, fp, lo, hi):
+        """Read the rows in the byte range [`lo`, `hi`) of a day file as 64-bit words.
+
+        Returns
+        -------
+        :class:`tuple`
+            The row times, and the data columns, as :class:`array.array`.
+        """
+        fp.seek(lo)
+        raw = fp.read(hi - lo)
+        ints, floats = array("q"), array("d")
+        ints.frombytes(raw)
+        floats.frombytes(raw)
+
+        if sys.byteorder == "big":
+            ints.byteswap()
+            floats.byteswap()
+
+        stride = self.ncols + 1
+
+        return ints[::stride], [floats[column::stride] for column in range(1, stride)]
+
+    def _record_time(self, fp, index):
+        """Read the time of the row with the specified index, in microseconds since midnight."""
+        fp.seek(index * self._record.size)
+        return int.from_bytes(fp.read(8), "little", signed=True)
+
+    def _read_shard_bounds(self, shard_path):
+        fp = self._shard_view(shard_path)
+        nrows = self._view_size(fp) // self._record.size
+
+        if not nrows:
+            return None
+
+        return (
+            us_to_time(self._record_time(fp, 0)),
+            us_to_time(self._record_time(fp, nrows - 1)),
+        )
+
+    def _read_compressed_bounds(self, shard_path):
+        size = self._record.size
+        tail = b""
+
+        with gzip.open(self._compressed_path(shard_path), "rb") as fp:
+            first_row = fp.read(size)
+
+            if len(first_row) < size:
+                return None
+
+            # Keep only the last row seen.
+            for block in iter(partial(fp.read, size * 4096), b""):
+                tail = (tail + block)[-size:]
+
+        last_row = tail or first_row
+
+        return (
+            us_to_time(int.from_bytes(first_row[:8], "little", signed=True)),
+            us_to_time(int.from_bytes(last_row[:8], "little", signed=True)),
+        )
+
+    def _seek_shard_time(self, shard_path, fp, target_time, after=False):
+        """Find the first row in a day file with a time not earlier than `target_time` (or later
+        than it, if `after` is set).
+
+        This is a binary search over the rows, so the file must be sorted.
+
+        Returns
+        -------
+        :class:`int`
+            The offset of the start of the row, or the file size if no such row exists.
+        """
+        target_us = time_to_us(target_time)
+        lo, hi = 0, self._view_size(fp) // self._record.size
+
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_us = self._record_time(fp, mid)
+
+            if mid_us < target_us or (after and mid_us == target_us):
+                lo = mid + 1
+            else:
+                hi = mid
+
+        return lo * self._record.size
+
+    def _query_shard(self, shard_date, windows, reverse=False):
+        midnight = datetime.combine(shard_date, time())
+
+        for start, stop in windows:
+            columns = self._query_shard_columns(shard_date, start, stop)
+
+            if columns is None:
+                continue
+
+            times, data = columns
+            rows = [
+                [midnight + timedelta(microseconds=time_us), list(values)]
+                for time_us, *values in zip(times, *data)
+            ]
+
+            if reverse:
+                rows.reverse()
+
+            yield from rows
+
+    def _query_shard_columns(self, shard_date, start, stop):
+        """Read the rows of a day file lying in the half-open interval [`start`, `stop`) into
+        columns.
+
+        Returns
+        -------
+        :class:`tuple` or None
+            The times in microseconds since midnight and the data columns, as
+            :class:`array.array`, or None if there are no rows in the interval.
+        """
+        bounds = self._shard_bounds(shard_date)
+
+        if bounds is None:
+            # No data.
+            return None
+
+        first_time, last_time = bounds
+
+        if last_time < start or first_time >= stop:
+            return None
+
+        shard_path = self._shard_path(shard_date)
+        fp = self._shard_view(shard_path)
+        lo = 0 if first_time >= start else self._seek_shard_time(shard_path, fp, start)
+        hi = (
+            self._view_size(fp) // self._record.size * self._record.size
+            if last_time < stop
+            else self._seek_shard_time(shard_path, fp, stop)
+        )
+
+        if lo >= hi:
+            return None
+
+        return self._read_records(fp, lo, hi)
+
+    @staticmethod
+    def _times_to_datetimes(shard_date, times):
+        midnight = datetime.combine(shard_date, time())
+        return [midnight + timedelta(microseconds=time_us) for time_us in times]
+
+    @staticmethod
+    def _times_to_us(shard_date, times):
+        day_us = (shard_date - EPOCH_DATE).days * US_PER_DAY
+        return [day_us + time_us for time_us in times]
+
+    def _reader_factory(self):
+        return partial(
+            BinaryDirectoryDriver, self.path, DriverAccessType.READ, self.ncols
+        )
+
+    def _shard_is_sorted(self, shard_path):
+        """Check whether a day file's rows are in time order.
+
+        The row times are compared up to :data:`SORT_RUN_LINES` rows at a time.
+        """
+        fp = self._shard_view(shard_path)
+        block_size = SORT_RUN_LINES * self._record.size
+        size = self._view_size(fp)
+        size -= size % self._record.size
+        last_time = -1
+
+        for lo in range(0, size, block_size):
+            times, _ = self._read_records(fp, lo, min(lo + block_size, size))
+
+            if last_time > times[0] or not all(map(le, times, islice(times, 1, None))):
+                return False
+
+            last_time = times[-1]
+
+        return True
+
+    def _sort_shard(self, shard_path):
+        """Sort day file.
+
+        Like :meth:`DirectoryDriver._sort_shard`, this is an external merge sort: runs of up to
+        :data:`SORT_RUN_LINES` rows are reordered in memory by time, without being unpacked, and
+        then merged. Memory use is therefore bounded however unsorted the file is. The sort is
+        stable.
+        """
+        fp_existing, fp_temp = self._shard_stream_with_tmp_buffer(
+            shard_path,
+            DriverAccessType.READ,  # Only read because we use a temporary write buffer instead.
+            create=False,
+        )
+
+        size = self._record.size
+        read_run = partial(fp_existing.read, SORT_RUN_LINES * size)
+        run_paths = []
+        fp_existing.seek(0)
+
+        try:
+            run = self._sort_rows(read_run())
+
+            while run:
+                next_run = self._sort_rows(read_run())
+
+                if not run_paths and not next_run:
+                    # There's only one run, so it doesn't need merging.
+                    fp_temp.write(run)
+                    break
+
+                # The run is deleted once it has been merged into the sorted file.
+                with NamedTemporaryFile(
+                    mode="wb",
+                    prefix=f"{shard_path.name}_run",
+                    dir=str(shard_path.parent),
+                    delete=False,
+                ) as fp_run:
+                    run_paths.append(Path(fp_run.name))
+                    fp_run.write(run)
+
+                run = next_run
+
+            run_files = [run_path.open("rb") for run_path in run_paths]
+
+            try:
+                # Rows at identical times are taken from earlier runs first.
+                merged_rows = merge(
+                    *[
+                        iter(partial(run_file.read, size), b"")
+                        for run_file in run_files
+                    ],
+                    key=self._row_time,
+                )
+
+                while True:
+                    batch = b"".join(islice(merged_rows, SORT_RUN_LINES))
+
+                    if not batch:
+                        break
+
+                    fp_temp.write(batch)
+            finally:
+                for run_file in run_files:
+                    run_file.close()
+        finally:
+            # Delete the runs.
+            for run_path in run_paths:
+                run_path.unlink()
+
+        # Overwrite the unsorted shard with the buffer.
+        self._shard_replace(fp_existing, fp_temp)
+
+    def _sort_rows(self, raw):
+        """Stably sort packed rows by time, dropping any trailing partial row."""
+        size = self._record.size
+        nrows = len(raw) // size
+        times = array("q")
+        times.frombytes(raw[: nrows * size])
+
+        if sys.byteorder == "big":
+            times.byteswap()
+
+        times = times[:: self.ncols + 1]
+        order = sorted(range(nrows), key=times.__getitem__)
+
+        return b"".join([raw[row * size : (row + 1) * size] for row in order])
+
+    @staticmethod
+    def _row_time(row):
+        """Get the time of a packed row, in microseconds since midnight."""
+        return int.from_bytes(row[:8], "little", signed=True)
+
+    def _update_index(self, shard_path, rebuild=False):
+        # Rows have a fixed width, so day files are searched directly without an index.
+        pass
+
+    @staticmethod
+    def _shard_unterminated(view, size):
+        # Rows have a fixed width and no terminator.
+        return False
+
+
+def _query_shard_rows(reader_factory, shard_date, windows):
+    """Parse the rows of a day file lying in the specified windows in a worker process.
+
+    See :meth:`.Cursor.iter_parallel`.
+    """
+    driver = reader_factory()
+    driver.open()
+
+    try:
+        return list(driver._query_shard(shard_date, windows))
+    finally:
+        driver.close()
+
+
+class Cursor(Reversible, Iterable):
+    """Query result cursor."""
+
+    def __init__(self, driver):
+        self._driver = driver
+        self.ranges = []
+
+    @classmethod
+    def from_range(cls, driver, start, stop):
+        """Build a Cursor from a driver and datetime interval."""
+        return cls.from_ranges(driver, [(start, stop)])
+
+    @classmethod
+    def from_ranges(cls, driver, ranges):
+        """Build a Cursor from a driver and datetime intervals.
+
+        The intervals are sorted and overlapping or adjacent intervals are merged.
+        """
+        cursor = cls(driver)
+
+        for start, stop in sorted(ranges):
+            if start > stop:
+                raise ValueError(f"start ({start}) cannot be > stop ({stop})")
+
+            if start == stop:
+                # Empty.
+                continue
+
+            if cursor.ranges and start <= cursor.ranges[-1][1]:
+                # Extend the previous interval.
+                previous_start, previous_stop = cursor.ranges[-1]
+                cursor.ranges[-1] = previous_start, max(previous_stop, stop)
+            else:
+                cursor.ranges.append((start, stop))
+
+        return cursor
+
+    def _iter_intervals(self, reverse=False):
+        """Generate the query's time spans for each day it covers.
+
+        Yields
+        ------
+        :class:`tuple`
+            The day, and a list of the (start, stop) time spans for that day.
+        """
+        shard_date, windows = None, []
+
+        for day, start, stop in self._iter_day_spans(reverse=reverse):
+            if day != shard_date:
+                if windows:
+                    yield shard_date, windows
+
+                shard_date, windows = day, []
+
+            windows.append((start, stop))
+
+        if windows:
+            yield shard_date, windows
+
+    def _iter_day_spans(self, reverse=False):
+        """Generate the query's time span for each day covered by each of its intervals.
+
+        The spans are generated lazily so that queries over long ranges don't have to build an
+        entry for every day up front.
+
+        Yields
+        ------
+        :class:`tuple`
+            The day, and the start and stop times for that day.
+        """
+        ranges = reversed(self.ranges) if reverse else self.ranges
+
+        for start, stop in ranges:
+            start_date = start.date()
+            stop_date = stop.date()
+
+            # Calculate the delta based on the dates, not datetimes, to avoid problems with end
+            # times before start times on different dates.
+            ndays = (stop_date - start_date).days
+            day_offsets = range(ndays, -1, -1) if reverse else range(ndays + 1)
+
+            for day_offset in day_offsets:
+                shard_date = start_date + timedelta(days=day_offset)
+
+                # Set the query's time span for the day.
+                query_start = start.time() if start_date == shard_date else time.min
+                query_stop = stop.time() if stop_date == shard_date else time.max
+
+                yield shard_date, query_start, query_stop
+
+    def _iter_prefetched_intervals(self, reverse=False):
+        """Generate the query's time spans for each day, prefetching upcoming day files."""
+        prefetch = self._driver._prefetch
+        pending = deque()
+
+        for interval in self._iter_intervals(reverse=reverse):
+            # Let the operating system read upcoming files while we parse the current one.
+            prefetch(interval[0])
+            pending.append(interval)
+
+            if len(pending) > PREFETCH_SHARDS:
+                yield pending.popleft()
+
+        yield from pending
+
+    def _iter_rows(self, reverse=False):
+        for shard_date, windows in self._iter_prefetched_intervals(reverse=reverse):
+            yield from self._driver._query_shard(shard_date, windows, reverse=reverse)
+
+    def _iter_column_batches(self):
+        for shard_date, windows in self._iter_prefetched_intervals():
+            for start, stop in windows:
+                batch = self._driver._query_shard_columns(shard_date, start, stop)
+
+                if batch is not None:
+                    yield (shard_date, *batch)
+
+    def batch_iter(self, chunk_rows=65536):
+        """Iterate over the query results in batches of columns.
+
+        This is much faster than iterating over the rows for large queries, since each day's
+        lines are parsed in bulk. Every line must have the same number of columns.
+
+        Parameters
+        ----------
+        chunk_rows : :class:`int`, optional
+            The maximum number of rows per batch.
+
+        Yields
+        ------
+        :class:`tuple`
+            The batch's times as a list of :py:class:`datetime.datetime`, and its data columns as
+            parsed by :meth:`.Device.parse_columns`.
+        """
+        ticks, columns = [], []
+
+        times_to_datetimes = self._driver._times_to_datetimes
+
+        for shard_date, shard_times, shard_columns in self._iter_column_batches():
+            shard_ticks = times_to_datetimes(shard_date, shard_times)
+
+            if ticks and len(shard_columns) != len(columns):
+                # The columns can't be combined with those of earlier days.
+                yield ticks, columns
+                ticks, columns = [], []
+
+            if ticks:
+                ticks.extend(shard_ticks)
+
+                for column, shard_column in zip(columns, shard_columns):
+                    column.extend(shard_column)
+            else:
+                ticks, columns = shard_ticks, shard_columns
+
+            while len(ticks) >= chunk_rows:
+                yield ticks[:chunk_rows], [column[:chunk_rows] for column in columns]
+
+                del ticks[:chunk_rows]
+
+                for column in columns:
+                    del column[:chunk_rows]
+
+        if ticks:
+            yield ticks, columns
+
+    def batches(self):
+        """Iterate over the query results as arrays, a day at a time.
+
+        This is the streaming form of :meth:`.to_arrays`: each day's results are parsed in bulk
+        and yielded as soon as they're read, so memory use is bounded by the largest day rather
+        than by the whole query. A day queried by several intervals yields a batch for each.
+
+        Yields
+        ------
+        :class:`tuple`
+            The times as microseconds since 1970-01-01T00:00 in a signed 64-bit integer
+            :class:`array.array`, and the data columns as parsed by :meth:`.Device.parse_columns`.
+        """
+        times_to_us = self._driver._times_to_us
+
+        for shard_date, shard_times, shard_columns in self._iter_column_batches():
+            yield array("q", times_to_us(shard_date, shard_times)), shard_columns
+
+    def to_arrays(self):
+        """Read all of the query results into arrays.
+
+        The times are returned as microseconds since 1970-01-01T00:00 in a signed 64-bit integer
+        :class:`array.array`, which numeric libraries can view without copying (e.g. with
+        ``numpy.frombuffer(ticks, "datetime64[us]")``). Any time zone information is ignored.
+        Every line must have the same number of columns.
+
+        Returns
+        -------
+        :class:`tuple`
+            The times, and the data columns as parsed by :meth:`.Device.parse_columns` and
+            concatenated across days.
+
+        Raises
+        ------
+        ValueError
+            If the lines don't all have the same number of columns.
+        """
+        ticks, columns = array("q"), None
+
+        for shard_ticks, shard_columns in self.batches():
+            ticks.extend(shard_ticks)
+
+            if columns is None:
+                columns = shard_columns
+            elif len(shard_columns) != len(columns):
+                raise ValueError(
+                    f"lines of {self._driver} don't all have the same number of columns"
+                )
+            else:
+                for column, shard_column in zip(columns, shard_columns):
+                    column.extend(shard_column)
+
+        return ticks, columns or []
+
+    def to_numpy(self):
+        """Read all of the query results into NumPy arrays.
+
+        This requires NumPy. The arrays are built from those returned by :meth:`.to_arrays`
+        without copying the data, where possible.
+
+        Returns
+        -------
+        :class:`tuple`
+            The times as a :class:`numpy.ndarray` of type ``datetime64[us]``, and a list with a
+            :class:`numpy.ndarray` for each data column.
+        """
+        import numpy as np
+
+        ticks, columns = self.to_arrays()
+
+        return (
+            np.frombuffer(ticks, dtype="datetime64[us]"),
+            [np.asarray(column) for column in columns],
+        )
+
+    def to_dataframe(self):
+        """Read all of the query results into a pandas data frame.
+
+        This requires NumPy and pandas. The data frame is indexed by time, and its columns are
+        numbered from zero.
+
+        Returns
+        -------
+        :class:`pandas.DataFrame`
+            The data.
+        """
+        import pandas as pd
+
+        ticks, columns = self.to_numpy()
+
+        return pd.DataFrame(dict(enumerate(columns)), index=pd.DatetimeIndex(ticks))
+
+    def iter_parallel(self, workers=None):
+        """Iterate over the query results, parsing day files in parallel in worker processes.
+
+        The results are the same, and in the same order, as iterating over the cursor. Rows have
+        to be sent back from the workers, so this is only faster for queries spanning many days
+        with lots of data each.
+
+        Parameters
+        ----------
+        workers : :class:`int`, optional
+            The number of worker processes. Defaults to the number of CPUs.
+
+        Yields
+        ------
+        :class:`list`
+            The time and data of each row.
+        """
+        driver = self._driver
+        workers = workers or os.cpu_count() or 1
+        query_shard = partial(_query_shard_rows, driver._reader_factory())
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+
+            try:
+                for shard_date, windows in self._iter_intervals():
+                    pending.append(executor.submit(query_shard, shard_date, windows))
+
+                    # Keep every worker busy without holding the whole query's results in memory.
+                    if len(pending) > 2 * workers:
+                        yield from pending.popleft().result()
+
+                while pending:
+                    yield from pending.popleft().result()
+            finally:
+                # Don't wait for days that won't be read if iteration stops early.
+                for future in pending:
+                    future.cancel()
 
     def __iter__(self):
-        for shard_date, (start, stop) in self.query_intervals.items():
-            yield from self._driver._parse_lines(shard_date, start, stop)
+        return self._iter_rows()
 
     def __reversed__(self):
-        for shard_date, (start, stop) in reversed(self.query_intervals.items()):
-            yield from self._driver._parse_lines(shard_date, start, stop, reverse=True)
+        return self._iter_rows(reverse=True)
@@ -1,5 +1,5 @@
 import pytest
-from taransaydb import Device, FloatDevice
+from taransaydb import Device, FloatDevice, BinaryFloatDevice
 
 
 @pytest.fixture
@@ -11,3 +11,8 @@ def test_device(tmp_path):
 @pytest.fixture
 def float_device(tmp_path):
     return FloatDevice(tmp_path, "test_device")
+
+
+@pytest.fixture
+def binary_device(tmp_path):
+    return BinaryFloatDevice(tmp_path, "binary_device", ncols=2)
@@ -1,4 +1,5 @@
-from datetime import timedelta
+from datetime import datetime, timedelta
+import pytest
 
 
 def test_append(float_device, faker):
@@ -17,3 +18,129 @@ def test_append(float_device, faker):
         )
 
     assert result == [[append_datetime, append_data]]
+
+
+def test_append_many(float_device, faker):
+    start = datetime(2020, 3, 26, 19, 30, 0)
+    stop = datetime(2020, 3, 28, 4, 0, 0)
+    interval = timedelta(minutes=5)
+
+    rows = [[tick, [value]] for tick, value in faker.time_series(start, stop, interval)]
+
+    with float_device.writer() as driver:
+        driver.append_many(rows)
+
+    with float_device.reader() as driver:
+        result = list(driver.query_interval(start, stop))
+
+    assert result == rows
+
+
+def test_append_mixed(float_device, faker):
+    start = datetime(2020, 3, 26, 23, 30, 0)
+    stop = datetime(2020, 3, 27, 0, 30, 0)
+    interval = timedelta(minutes=5)
+
+    rows = [[tick, [value]] for tick, value in faker.time_series(start, stop, interval)]
+
+    # Alternate single and batched appends, crossing into the next day.
+    with float_device.writer() as driver:
+        for index, (tick, data) in enumerate(rows):
+            if index % 3:
+                driver.append(tick, data)
+            else:
+                driver.append_many([(tick, data)])
+
+    with float_device.reader() as driver:
+        result = list(driver.query_interval(start, stop))
+
+    assert result == rows
+
+
+def test_append_kept_on_error(float_device, faker):
+    append_datetime = faker.date_time()
+    append_data = [faker.pyfloat(), faker.pyfloat()]
+
+    with pytest.raises(RuntimeError):
+        with float_device.writer() as driver:
+            driver.append(append_datetime, append_data)
+            raise RuntimeError
+
+    with float_device.reader() as driver:
+        result = list(
+            driver.query_interval(
+                append_datetime, append_datetime + timedelta(seconds=1)
+            )
+        )
+
+    assert result == [[append_datetime, append_data]]
+
+
+def test_device_append_many(float_device, faker):
+    start = datetime(2020, 3, 26, 19, 30, 0)
+    stop = datetime(2020, 4, 2, 7, 0, 0)
+
+    rows = [
+        [faker.date_time_between_dates(start, stop), [faker.pyfloat()]]
+        for _ in range(50)
+    ]
+
+    float_device.append_many(rows)
+    float_device.sort()
+
+    with float_device.reader() as driver:
+        result = list(driver.query_interval(start, stop))
+
+    assert result == sorted(rows)
+
+
+def test_float_format_line(test_device, float_device, faker):
+    for ncols in range(1, 4):
+        tick_time = faker.date_time().time()
+        data = [faker.pyfloat() for _ in range(ncols)]
+
+        assert float_device.format_line(tick_time, data) == test_device.format_line(
+            tick_time, data
+        )
+
+
+def test_float_parse_data(float_device, faker):
+    for ncols in range(0, 4):
+        data = [faker.pyfloat() for _ in range(ncols)]
+
+        assert float_device.parse_data([str(value) for value in data]) == data
+
+
+def test_append_with_evictions(float_device, faker, monkeypatch):
+    # Keep fewer files open than the number of days written to.
+    monkeypatch.setattr("taransaydb.driver.MAX_OPEN_SHARDS", 3)
+    monkeypatch.setattr("taransaydb.driver.PREFETCH_SHARDS", 2)
+
+    start = datetime(2020, 3, 20, 0, 0, 0)
+    days = [start + timedelta(days=day) for day in range(8)]
+
+    # Alternate between days, so each day's file is evicted with appends still buffered.
+    rows = [
+        [day + timedelta(hours=hour), [faker.pyfloat()]]
+        for hour in range(24)
+        for day in days
+    ]
+    inserts = [
+        [day + timedelta(hours=hour, minutes=30), [faker.pyfloat()]]
+        for hour in range(0, 24, 5)
+        for day in days
+    ]
+
+    with float_device.writer() as driver:
+        for tick, data in rows:
+            driver.append(tick, data)
+
+            assert len(driver._file_cache) <= 3
+
+        for tick, data in inserts:
+            driver.insert(tick, data)
+
+    with float_device.reader() as driver:
+        result = list(driver.query_interval(start, start + timedelta(days=8)))
+
+    assert result == sorted(rows + inserts, key=lambda row: row[0])
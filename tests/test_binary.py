@@ -0,0 +1,67 @@
+from datetime import date, datetime, timedelta
+from random import shuffle
+import pytest
+
+
+@pytest.fixture
+def binary_rows(faker):
+    start = datetime(2020, 3, 26, 19, 30, 0)
+    stop = datetime(2020, 3, 29, 4, 0, 0)
+    interval = timedelta(seconds=45)
+
+    rows = [
+        [tick, [value, faker.pyfloat()]]
+        for tick, value in faker.time_series(start, stop, interval)
+    ]
+
+    return start, stop, rows
+
+
+def test_binary_query(binary_device, binary_rows):
+    start, stop, rows = binary_rows
+
+    with binary_device.writer() as driver:
+        driver.append_many(rows[: len(rows) // 2])
+
+        for tick, data in rows[len(rows) // 2 :]:
+            driver.append(tick, data)
+
+    assert (binary_device.path / "2020" / "03" / "27.bin").is_file()
+
+    with binary_device.reader() as driver:
+        assert list(driver.query_interval(start, stop)) == rows
+
+
+@pytest.mark.parametrize("run_lines", [1 << 16, 500])
+def test_binary_sort_and_insert(binary_device, binary_rows, monkeypatch, run_lines):
+    # Small runs make the sort merge several runs per day.
+    monkeypatch.setattr("taransaydb.driver.SORT_RUN_LINES", run_lines)
+    start, stop, rows = binary_rows
+    shuffled_rows = rows[1:]
+    shuffle(shuffled_rows)
+
+    with binary_device.writer() as driver:
+        driver.append_many(shuffled_rows)
+        driver.sort()
+        driver.insert(*rows[0])
+        driver.compact(before=date(2020, 3, 28))
+
+    with binary_device.reader() as driver:
+        assert list(driver.query_interval(start, stop)) == rows
+
+
+def test_binary_wrong_number_of_columns(binary_device):
+    with binary_device.writer() as driver:
+        with pytest.raises(ValueError):
+            driver.append(datetime(2020, 3, 26), [1.0])
+
+
+def test_import_device(binary_device, float_device, binary_rows):
+    start, stop, rows = binary_rows
+    float_device.append_many(rows)
+    float_device.compact(before=date(2020, 3, 28))
+
+    binary_device.import_device(float_device)
+
+    with binary_device.reader() as driver:
+        assert list(driver.query_interval(start, stop)) == rows
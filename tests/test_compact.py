@@ -0,0 +1,96 @@
+from datetime import date, datetime, timedelta
+import pytest
+
+
+def test_compact(float_device, faker):
+    start = datetime(2020, 3, 26, 19, 30, 0)
+    stop = datetime(2020, 3, 29, 4, 0, 0)
+    interval = timedelta(minutes=1)
+
+    rows = [[tick, [value]] for tick, value in faker.time_series(start, stop, interval)]
+
+    with float_device.writer() as driver:
+        driver.append_many(rows)
+        driver.compact(before=date(2020, 3, 28))
+
+    assert not (float_device.path / "2020" / "03" / "27.txt").exists()
+    assert (float_device.path / "2020" / "03" / "27.txt.gz").is_file()
+    assert (float_device.path / "2020" / "03" / "28.txt").is_file()
+
+    with float_device.reader() as driver:
+        assert list(driver.query_interval(start, stop)) == rows
+
+        # Partial days.
+        query_start = faker.date_time_between_dates(start, stop)
+        query_stop = faker.date_time_between_dates(query_start, stop)
+        expected = [row for row in rows if query_start <= row[0] < query_stop]
+        assert list(driver.query_interval(query_start, query_stop)) == expected
+
+
+def test_compacted_days_are_evicted(float_device, faker, monkeypatch):
+    monkeypatch.setattr("taransaydb.driver.MAX_EXPANDED_SHARDS", 3)
+
+    start = datetime(2020, 3, 20, 0, 0, 0)
+    stop = datetime(2020, 3, 30, 0, 0, 0)
+    interval = timedelta(hours=1)
+
+    rows = [[tick, [value]] for tick, value in faker.time_series(start, stop, interval)]
+
+    with float_device.writer() as driver:
+        driver.append_many(rows)
+        driver.compact()
+
+    with float_device.reader() as driver:
+        assert list(driver.query_interval(start, stop)) == rows
+
+        # Only the most recently read days are held in memory.
+        assert len(driver._expanded_views) == 3
+
+
+def test_append_to_compacted_day(float_device, faker):
+    tick1 = datetime(2020, 3, 26, 19, 30, 0)
+    tick2 = datetime(2020, 3, 26, 19, 31, 0)
+    data = [faker.pyfloat()]
+
+    with float_device.writer() as driver:
+        driver.append(tick1, data)
+        driver.compact()
+        driver.append(tick2, data)
+
+    assert not (float_device.path / "2020" / "03" / "26.txt.gz").exists()
+
+    with float_device.reader() as driver:
+        result = list(driver.query_interval(tick1, tick2 + timedelta(seconds=1)))
+
+    assert result == [[tick1, data], [tick2, data]]
+
+
+@pytest.mark.parametrize("device_fixture", ["float_device", "binary_device"])
+def test_compacted_bounds_are_streamed(device_fixture, request, faker):
+    device = request.getfixturevalue(device_fixture)
+    ncols = getattr(device, "ncols", 1)
+    start = datetime(2020, 3, 26, 19, 30, 0)
+    stop = datetime(2020, 3, 28, 4, 0, 0)
+    interval = timedelta(minutes=1)
+
+    rows = [
+        [tick, [value] * ncols]
+        for tick, value in faker.time_series(start, stop, interval)
+    ]
+
+    with device.writer() as driver:
+        driver.append_many(rows)
+        driver.compact()
+
+    with device.reader() as driver:
+        assert driver._shard_bounds(date(2020, 3, 27)) == (
+            rows[270][0].time(),
+            rows[1709][0].time(),
+        )
+        assert driver._shard_bounds(date(2020, 3, 26)) == (
+            start.time(),
+            rows[269][0].time(),
+        )
+
+        # Reading the bounds doesn't decompress whole days into memory.
+        assert not driver._expanded_views
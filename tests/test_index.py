@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+import pytest
+from taransaydb.driver import INDEX_STRIDE
+
+
+@pytest.fixture
+def indexed_device(float_device, faker):
+    start = datetime(2020, 5, 3, 0, 0, 0)
+    stop = datetime(2020, 5, 4, 0, 0, 0)
+    interval = timedelta(seconds=5)
+
+    rows = [[tick, [value]] for tick, value in faker.time_series(start, stop, interval)]
+
+    with float_device.writer() as driver:
+        driver.append_many(rows)
+
+    return float_device, rows
+
+
+def test_index_written_on_close(indexed_device):
+    device, _ = indexed_device
+    shard_path = device.path / "2020" / "05" / "03.txt"
+    index_path = device.path / "2020" / "05" / "03.txt.idx"
+
+    # Up to one entry (two int64s) per stride.
+    index_size = index_path.stat().st_size
+    assert index_size % 16 == 0
+    assert 0 < index_size // 16 <= shard_path.stat().st_size // INDEX_STRIDE
+
+
+def test_stale_index_is_ignored(indexed_device, faker):
+    """Editing a day file outside of TaransayDB invalidates its index."""
+    device, rows = indexed_device
+    shard_path = device.path / "2020" / "05" / "03.txt"
+
+    # Remove the first hour of data, shifting all of the offsets in the index.
+    rows = [row for row in rows if row[0] >= datetime(2020, 5, 3, 1, 0, 0)]
+    shard_path.write_text(
+        "".join(f"{tick.time()} {value}\n" for tick, (value,) in rows)
+    )
+
+    with device.reader() as driver:
+        for _ in range(10):
+            start = faker.date_time_between_dates(rows[0][0], rows[-1][0])
+            stop = start + timedelta(minutes=10)
+            expected = [row for row in rows if start <= row[0] < stop]
+
+            assert list(driver.query_interval(start, stop)) == expected
+
+
+def test_no_index_for_small_days(float_device):
+    index_path = float_device.path / "2020" / "05" / "03.txt.idx"
+
+    with float_device.writer() as driver:
+        driver.append(datetime(2020, 5, 3, 12, 0, 0), [1.0])
+        driver.insert(datetime(2020, 5, 3, 6, 0, 0), [2.0])
+
+    assert not index_path.exists()
+
+    with float_device.writer() as driver:
+        driver.sort()
+
+    assert not index_path.exists()
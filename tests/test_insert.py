@@ -1,4 +1,5 @@
 from datetime import datetime, timedelta
+import pytest
 
 
 def test_insert(float_device, faker):
@@ -17,3 +18,93 @@ def test_insert(float_device, faker):
         result = list(driver.query_interval(tick1, tick2 + timedelta(seconds=1)))
 
     assert result == [[tick1, data], [insert_datetime, data], [tick2, data]]
+
+
+def test_insert_after_unterminated_line(test_device):
+    shard_path = test_device.path / "2020" / "01" / "01.txt"
+    shard_path.parent.mkdir(parents=True)
+    shard_path.write_text("00:00:01 a\n00:00:03 c")
+
+    with test_device.writer() as driver:
+        driver.insert(datetime(2020, 1, 1, 0, 0, 2), ["b"])
+        driver.insert(datetime(2020, 1, 1, 0, 0, 4), ["d"])
+        driver.insert(datetime(2020, 1, 1, 0, 0, 5), ["e"])
+
+    assert (
+        shard_path.read_text()
+        == "00:00:01 a\n00:00:02 b\n00:00:03 c\n00:00:04 d\n00:00:05 e\n"
+    )
+
+
+def test_failed_insert_keeps_other_days(test_device):
+    shard_path = test_device.path / "2020" / "01" / "01.txt"
+    shard_path.parent.mkdir(parents=True)
+    shard_path.write_text("00:00:01 a\nGARBAGE\n00:00:03 c\n")
+
+    with pytest.raises(ValueError):
+        with test_device.writer() as driver:
+            driver.insert(datetime(2020, 1, 1, 0, 0, 2), ["b"])
+            driver.insert(datetime(2020, 1, 3, 0, 0, 1), ["e"])
+            driver.append(datetime(2020, 1, 2, 0, 0, 1), ["d"])
+
+    # The malformed day is left as it was, without the merge's temporary file.
+    assert shard_path.read_text() == "00:00:01 a\nGARBAGE\n00:00:03 c\n"
+    assert [
+        path.name for path in shard_path.parent.iterdir() if path.name.startswith("01")
+    ] == ["01.txt"]
+
+    # The other days are still written, and every file is closed.
+    assert (shard_path.parent / "02.txt").read_text() == "00:00:01 d\n"
+    assert (shard_path.parent / "03.txt").read_text() == "00:00:01 e\n"
+    assert not driver._file_cache
+
+
+def test_insert_keeps_order(float_device, faker):
+    start = datetime(2020, 2, 15, 0, 0, 0)
+    stop = datetime(2020, 2, 16, 0, 0, 0)
+    interval = timedelta(seconds=10)
+
+    rows = [[tick, [value]] for tick, value in faker.time_series(start, stop, interval)]
+    inserts = [
+        [faker.date_time_between_dates(start, stop), [faker.pyfloat()]]
+        for _ in range(20)
+    ]
+
+    with float_device.writer() as driver:
+        driver.append_many(rows)
+
+        for tick, data in inserts:
+            driver.insert(tick, data)
+
+    with float_device.reader() as driver:
+        result = list(driver.query_interval(start, stop))
+
+    assert result == sorted(rows + inserts, key=lambda row: row[0])
+
+
+def test_pending_inserts(float_device, faker, monkeypatch):
+    # Merge some of the inserts before the driver is closed.
+    monkeypatch.setattr("taransaydb.driver.MAX_PENDING_INSERTS", 3)
+
+    start = datetime(2020, 2, 15, 0, 0, 0)
+    stop = datetime(2020, 2, 17, 0, 0, 0)
+    rows = [
+        [start + timedelta(hours=hours), [float(hours)]] for hours in range(0, 24, 3)
+    ]
+
+    # Inserts at identical times keep their order, and can be on days without data.
+    inserts = [
+        [start + timedelta(hours=faker.pyint(max_value=47)), [float(index)]]
+        for index in range(10)
+    ]
+
+    with float_device.writer() as driver:
+        driver.append_many(rows)
+
+        for tick, data in inserts:
+            driver.insert(tick, data)
+
+    with float_device.reader() as driver:
+        result = list(driver.query_interval(start, stop))
+
+    assert result == sorted(rows + inserts, key=lambda row: row[0])
@@ -66,12 +66,217 @@ def test_date_range(regular_interval_data_device):
     )
 
 
-def test_reverse(regular_interval_data_device, faker):
+def test_overlapping_intervals(regular_interval_data_device, faker):
     driver, start, stop, _ = regular_interval_data_device
 
-    threshold = faker.date_time_between_dates(start, stop)
+    all_rows = list(driver.query_interval(start, stop))
+    intervals = []
 
-    query_forward = list(driver.query_interval(start, threshold))
-    query_reverse = list(reversed(driver.query_interval(start, threshold)))
+    for _ in range(10):
+        interval_start = faker.date_time_between_dates(start, stop)
+        interval_stop = interval_start + timedelta(hours=faker.pyint(max_value=36))
+        intervals.append((interval_start, interval_stop))
 
-    assert query_reverse == list(reversed(query_forward))
+    expected = [
+        row
+        for row in all_rows
+        if any(
+            interval_start <= row[0] < interval_stop
+            for interval_start, interval_stop in intervals
+        )
+    ]
+
+    query = driver.query_intervals(intervals)
+    assert list(query) == expected
+    assert list(reversed(query)) == list(reversed(expected))
+
+
+def _rows_from_columns(ticks, columns):
+    return [
+        [datetime(1970, 1, 1) + timedelta(microseconds=tick), list(data)]
+        for tick, data in zip(ticks, zip(*columns))
+    ]
+
+
+def _read_list(query):
+    return list(query)
+
+
+def _read_reversed(query):
+    return list(reversed(list(reversed(query))))
+
+
+def _read_iter_parallel(query):
+    return list(query.iter_parallel(workers=2))
+
+
+def _read_to_arrays(query):
+    return _rows_from_columns(*query.to_arrays())
+
+
+def _read_batches(query):
+    rows, dates = [], set()
+
+    for ticks, columns in query.batches():
+        batch_rows = _rows_from_columns(ticks, columns)
+        rows.extend(batch_rows)
+
+        # At most one batch per day.
+        batch_dates = {tick.date() for tick, _ in batch_rows}
+        assert len(batch_dates) <= 1 and not batch_dates & dates
+        dates |= batch_dates
+
+    return rows
+
+
+def _read_batch_iter(query):
+    rows = []
+
+    for ticks, columns in query.batch_iter(chunk_rows=1000):
+        assert len(ticks) <= 1000
+        rows.extend([tick, list(data)] for tick, data in zip(ticks, zip(*columns)))
+
+    return rows
+
+
+def _read_to_numpy(query):
+    np = pytest.importorskip("numpy")
+    ticks, columns = query.to_numpy()
+
+    assert ticks.dtype == np.dtype("datetime64[us]")
+
+    columns = [column.tolist() for column in columns]
+    return [[tick, list(data)] for tick, data in zip(ticks.tolist(), zip(*columns))]
+
+
+def _read_to_dataframe(query):
+    pytest.importorskip("pandas")
+    frame = query.to_dataframe()
+
+    return [
+        [tick.to_pydatetime(), list(data)]
+        for tick, data in zip(frame.index, frame.itertuples(index=False))
+    ]
+
+
+@pytest.fixture(params=["float_device", "binary_device"])
+def random_data_device(request, faker):
+    device = request.getfixturevalue(request.param)
+    ncols = getattr(device, "ncols", 1)
+    start = datetime(2020, 4, 30, 4, 48, 30)
+    stop = datetime(2020, 5, 3, 2, 57, 0)
+    interval = timedelta(minutes=1)
+
+    rows = [
+        [tick, [value] + [faker.pyfloat() for _ in range(ncols - 1)]]
+        for tick, value in faker.time_series(start, stop, interval)
+    ]
+    device.append_many(rows)
+
+    return device, rows
+
+
+@pytest.mark.parametrize(
+    "read",
+    [
+        _read_list,
+        _read_reversed,
+        _read_iter_parallel,
+        _read_to_arrays,
+        _read_batches,
+        _read_batch_iter,
+        _read_to_numpy,
+        _read_to_dataframe,
+    ],
+    ids=lambda read: read.__name__[len("_read_") :],
+)
+def test_random_windows(random_data_device, read, faker):
+    """Each way of reading a query gives the rows in the window, in both drivers."""
+    device, rows = random_data_device
+    start, stop = rows[0][0], rows[-1][0]
+
+    with device.reader() as driver:
+        for _ in range(3):
+            # Windows both within a day and spanning several.
+            query_start = faker.date_time_between_dates(start, stop)
+            query_stop = query_start + timedelta(minutes=faker.pyint(max_value=2160))
+            expected = [row for row in rows if query_start <= row[0] < query_stop]
+
+            assert read(driver.query_interval(query_start, query_stop)) == expected
+
+
+def test_iter_parallel_after_read(float_device, faker):
+    start = datetime(2020, 4, 30, 4, 48, 30)
+    stop = datetime(2020, 5, 3, 2, 57, 0)
+    interval = timedelta(minutes=5)
+
+    rows = [[tick, [value]] for tick, value in faker.time_series(start, stop, interval)]
+    float_device.append_many(rows)
+
+    with float_device.reader() as driver:
+        query = driver.query_interval(start, stop)
+
+        # Parse some rows in this process first, so the device has cached any state it needs.
+        assert list(query) == rows
+        assert list(query.iter_parallel(workers=2)) == rows
+
+
+@pytest.mark.parametrize("device_fixture", ["float_device", "binary_device"])
+def test_reader_sees_later_appends(device_fixture, request, faker):
+    device = request.getfixturevalue(device_fixture)
+    start = datetime(2020, 1, 1, 0, 0, 0)
+    stop = datetime(2020, 1, 2, 0, 0, 0)
+    rows = [
+        [start + timedelta(minutes=minutes), [faker.pyfloat(), faker.pyfloat()]]
+        for minutes in range(20)
+    ]
+
+    device.append_many(rows[:10])
+
+    with device.reader() as driver:
+        query = driver.query_interval(start, stop)
+        later_query = driver.query_interval(rows[15][0], stop)
+        assert list(query) == rows[:10]
+        assert list(later_query) == []
+
+        # Another writer appends to the day file while the reader is open.
+        device.append_many(rows[10:])
+
+        assert list(query) == rows
+        assert list(later_query) == rows[15:]
+
+
+def test_blank_and_unterminated_lines(test_device):
+    shard_path = test_device.path / "2020" / "01" / "01.txt"
+    shard_path.parent.mkdir(parents=True)
+    shard_path.write_text("00:00:01 a\n\n00:00:02 b\n00:00:03 c")
+
+    with test_device.reader() as driver:
+        query = driver.query_interval(datetime(2020, 1, 1), datetime(2020, 1, 2))
+
+        assert list(query) == [
+            [datetime(2020, 1, 1, 0, 0, 1), ["a"]],
+            [datetime(2020, 1, 1, 0, 0, 2), ["b"]],
+            [datetime(2020, 1, 1, 0, 0, 3), ["c"]],
+        ]
+        assert list(reversed(query)) == list(reversed(list(query)))
+
+
+def test_query_over_gap_keeps_open_files(float_device, monkeypatch):
+    monkeypatch.setattr("taransaydb.driver.MAX_OPEN_SHARDS", 3)
+    monkeypatch.setattr("taransaydb.driver.PREFETCH_SHARDS", 2)
+
+    # Three days of data either side of a week-long gap.
+    ticks = [datetime(2020, 3, day, 12, 0, 0) for day in (1, 2, 3, 11)]
+    rows = [[tick, [float(index)]] for index, tick in enumerate(ticks)]
+    float_device.append_many(rows)
+
+    with float_device.reader() as driver:
+        assert list(driver.query_interval(ticks[0], ticks[2])) == rows[:2]
+        open_files = dict(driver._file_cache)
+        assert len(open_files) == 3
+
+        # Looking for the missing days doesn't close any of the open files.
+        gap_end = datetime(2020, 3, 10, 12, 0, 0)
+        assert list(driver.query_interval(ticks[2], gap_end)) == rows[2:3]
+        assert driver._file_cache == open_files
@@ -1,14 +1,15 @@
+import shutil
 from datetime import datetime, timedelta
 from copy import copy
 from random import shuffle
+import pytest
 
 
 def test_sort(float_device, faker):
     """Test database sorting.
 
-    This generates unique datetimes in a regularly spaced interval. The datetimes must be unique
-    because the sorting algorithm is a merge sort which is not stable; this rules out the use of
-    Faker's `date_times_between` method.
+    This generates unique datetimes in a regularly spaced interval, so that the expected order is
+    unambiguous; this rules out the use of Faker's `date_times_between` method.
     """
     start = datetime(2020, 3, 24, 0, 0, 0)
     stop = datetime(2020, 4, 9, 23, 59, 59)
@@ -35,3 +36,89 @@ def test_sort(float_device, faker):
         result = list(driver.query_interval(start, stop + timedelta(seconds=1)))
 
     assert result == data
+
+
+def test_sort_is_stable(float_device, faker, monkeypatch):
+    # Sort in several runs.
+    monkeypatch.setattr("taransaydb.driver.SORT_RUN_LINES", 10)
+
+    start = datetime(2020, 3, 24, 0, 0, 0)
+    ticks = [start + timedelta(minutes=faker.pyint(max_value=20)) for _ in range(100)]
+    data = [[tick, [float(index)]] for index, tick in enumerate(ticks)]
+
+    with float_device.writer() as driver:
+        driver.append_many(data)
+        driver.sort()
+
+    with float_device.reader() as driver:
+        result = list(driver.query_interval(start, start + timedelta(hours=1)))
+
+    assert result == sorted(data, key=lambda row: row[0])
+
+
+def test_system_sort(float_device, faker, monkeypatch):
+    if shutil.which("sort") is None:
+        pytest.skip("no sort command")
+
+    monkeypatch.setattr("taransaydb.driver.SYSTEM_SORT_MIN_SIZE", 0)
+
+    start = datetime(2020, 3, 24, 0, 0, 0)
+    ticks = [start + timedelta(minutes=faker.pyint(max_value=20)) for _ in range(100)]
+    data = [[tick, [float(index)]] for index, tick in enumerate(ticks)]
+
+    with float_device.writer() as driver:
+        driver.append_many(data)
+        driver.sort()
+
+    with float_device.reader() as driver:
+        result = list(driver.query_interval(start, start + timedelta(hours=1)))
+
+    assert result == sorted(data, key=lambda row: row[0])
+
+
+def test_sort_skips_sorted_files(float_device, faker):
+    start = datetime(2020, 3, 24, 0, 0, 0)
+    stop = datetime(2020, 3, 25, 12, 0, 0)
+    interval = timedelta(minutes=5)
+
+    data = [[tick, [value]] for tick, value in faker.time_series(start, stop, interval)]
+
+    # Misorder the second day only.
+    data[-1], data[-2] = data[-2], data[-1]
+
+    with float_device.writer() as driver:
+        driver.append_many(data)
+
+    sorted_path = float_device.path / "2020" / "03" / "24.txt"
+    unsorted_path = float_device.path / "2020" / "03" / "25.txt"
+    sorted_inode = sorted_path.stat().st_ino
+    unsorted_inode = unsorted_path.stat().st_ino
+
+    with float_device.writer() as driver:
+        driver.sort()
+
+    # Only the misordered day file is replaced.
+    assert sorted_path.stat().st_ino == sorted_inode
+    assert unsorted_path.stat().st_ino != unsorted_inode
+
+    with float_device.reader() as driver:
+        result = list(driver.query_interval(start, stop))
+
+    assert result == sorted(data, key=lambda row: row[0])
+
+
+@pytest.mark.parametrize("min_size", [0, 1 << 20])
+def test_sort_rejects_corrupt_lines(test_device, monkeypatch, min_size):
+    monkeypatch.setattr("taransaydb.driver.SYSTEM_SORT_MIN_SIZE", min_size)
+
+    shard_path = test_device.path / "2020" / "03" / "24.txt"
+    shard_path.parent.mkdir(parents=True)
+    contents = "00:00:02 b\n00:00:01 a\nGARBAGE\n"
+    shard_path.write_text(contents)
+
+    with test_device.writer() as driver:
+        with pytest.raises(ValueError):
+            driver.sort()
+
+    # The file is left as it was.
+    assert shard_path.read_text() == contents